@@ -1,5 +1,7 @@
 from .pyscroll import BufferedRenderer, ThreadedRenderer
 from .data import TiledMapData
+from .cache import TileStackCache, ChunkCache
+from .chunked import ChunkedRenderer
 from .util import *
 
 __version__ = '2.15.0'
@@ -0,0 +1,9 @@
+"""
+Benchmarks for the pyscroll renderers.
+
+Each benchmark is a module that can be run with python -m, for example:
+
+    python -m pyscroll.benchmarks.sprites
+
+The SDL dummy video driver is used, so no window is opened.
+"""
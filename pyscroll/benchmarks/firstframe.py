@@ -0,0 +1,58 @@
+"""
+Benchmark the time to the first frame of a map with a big tileset.
+
+Loads the map with pytmx, scaled like the demo game, makes a renderer and
+draws one frame.  The tile images are made up front, then with lazy_images,
+where only the tiles that are drawn are made before the first frame.  With
+lazy images, the time for a warm up thread to make the rest of the tiles is
+reported too.
+
+    python -m pyscroll.benchmarks.firstframe
+"""
+
+import time
+
+from .maps import init_display, make_map
+
+SIZE = 640, 480
+TILESET_SIZE = 64, 64
+SCALE = 2
+
+
+def first_frame(filename, lazy_images):
+    """ Return the seconds to load the map and draw a frame, and the map
+    """
+    import pygame
+    import pytmx
+    import pyscroll
+
+    surface = pygame.Surface(SIZE)
+    start = time.time()
+    tmx = pytmx.load_pygame(filename, lazy_images=lazy_images, scale=SCALE)
+    renderer = pyscroll.BufferedRenderer(pyscroll.TiledMapData(tmx), SIZE)
+    renderer.center((SIZE[0] // 2, SIZE[1] // 2))
+    renderer.draw(surface, surface.get_rect())
+    return time.time() - start, tmx
+
+
+def main():
+    from pytmx.tmxloader import warm_up_images
+
+    init_display()
+    filename = make_map(200, 150, layers=2, tile_size=(32, 32),
+                        alpha=True, tileset_size=TILESET_SIZE)
+    print('{0}x{1} tileset, scale {2}, {3}x{4} view'.format(
+        TILESET_SIZE[0], TILESET_SIZE[1], SCALE, SIZE[0], SIZE[1]))
+
+    seconds, tmx = first_frame(filename, False)
+    print('{0:12} first frame {1:.3f} s'.format('up front', seconds))
+
+    seconds, tmx = first_frame(filename, True)
+    start = time.time()
+    warm_up_images(tmx, (10, 7)).join()
+    print('{0:12} first frame {1:.3f} s, warm up {2:.3f} s'.format(
+        'lazy', seconds, time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Synthetic maps for the benchmarks.
+
+Maps are written as TMX files with a generated tileset image, then loaded
+with pytmx like any other map.
+"""
+
+import os
+import random
+import struct
+import zlib
+import base64
+import tempfile
+
+__all__ = ['init_display', 'make_map', 'load_map']
+
+TILESET_COLUMNS = 8
+TILESET_ROWS = 8
+COLORKEY = 'ff00ff'
+
+
+def init_display(size=(1, 1)):
+    """ Set up pygame with the dummy video driver
+
+    The display must be set before maps are loaded, so tiles can be
+    converted.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    pygame.display.init()
+    return pygame.display.set_mode(size)
+
+
+def make_tileset(filename, tile_size, colorkey=False, alpha=False,
+                 tileset_size=(TILESET_COLUMNS, TILESET_ROWS)):
+    """ Save a tileset image where each tile has a different color
+
+    if colorkey is true, each tile will have a hole filled with the colorkey.
+    if alpha is true, the hole will be transparent pixels instead.
+    tileset_size is the number of columns and rows of tiles.
+    """
+    import pygame
+
+    tw, th = tile_size
+    columns, rows = tileset_size
+    size = tw * columns, th * rows
+    if alpha:
+        image = pygame.Surface(size, pygame.SRCALPHA, 32)
+    else:
+        image = pygame.Surface(size)
+    for index in range(columns * rows):
+        x = index % columns * tw
+        y = index // columns * th
+        color = (index * 37 % 256, index * 91 % 256, index * 13 % 256)
+        image.fill(color, (x, y, tw, th))
+        hole = (x + tw // 4, y + th // 4, tw // 2, th // 2)
+        if alpha:
+            image.fill((0, 0, 0, 0), hole)
+        elif colorkey:
+            image.fill(pygame.Color('#' + COLORKEY), hole)
+    pygame.image.save(image, filename)
+
+
+def make_layer_data(width, height, density, rnd,
+                    count=TILESET_COLUMNS * TILESET_ROWS):
+    """ Return base64 and zlib encoded gids for a layer
+
+    density is the fraction of cells that are not empty.  count is the
+    number of tiles in the tileset.
+    """
+    gids = [rnd.randint(1, count) if rnd.random() < density else 0
+            for i in range(width * height)]
+    data = struct.pack('<{0}L'.format(len(gids)), *gids)
+    return base64.b64encode(zlib.compress(data)).decode('ascii')
+
+
+def make_map(width, height, layers=3, tile_size=(16, 16), colorkey=False,
+             densities=None, seed=0, directory=None, alpha=False,
+             tileset_size=(TILESET_COLUMNS, TILESET_ROWS)):
+    """ Write a TMX map with random tiles and return the filename
+
+    the first layer is always full; other layers use densities, a list with
+    the fraction of occupied cells for each layer after the first.  tiles
+    have holes if colorkey or alpha is true; see make_tileset.  tileset_size
+    is the number of columns and rows of tiles in the tileset.
+    """
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix='pyscroll-bench-')
+
+    if densities is None:
+        densities = [.5] * (layers - 1)
+
+    rnd = random.Random(seed)
+    tw, th = tile_size
+    suffix = 'a' if alpha else 'ck' if colorkey else ''
+    columns, rows = tileset_size
+    tileset = 'tileset{0}x{1}{2}.png'.format(tw, th, suffix)
+    make_tileset(os.path.join(directory, tileset), tile_size, colorkey, alpha,
+                 tileset_size)
+
+    trans = ' trans="{0}"'.format(COLORKEY) if colorkey and not alpha else ''
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<map version="1.0" orientation="orthogonal" width="{0}" '
+        'height="{1}" tilewidth="{2}" tileheight="{3}">'.format(
+            width, height, tw, th),
+        ' <tileset firstgid="1" name="bench" tilewidth="{0}" '
+        'tileheight="{1}">'.format(tw, th),
+        '  <image source="{0}"{1} width="{2}" height="{3}"/>'.format(
+            tileset, trans, tw * columns, th * rows),
+        ' </tileset>']
+
+    for index in range(layers):
+        density = 1.0 if index == 0 else densities[index - 1]
+        lines.append(
+            ' <layer name="layer{0}" width="{1}" height="{2}">'
+            '<data encoding="base64" compression="zlib">{3}</data>'
+            '</layer>'.format(index, width, height,
+                              make_layer_data(width, height, density, rnd,
+                                              columns * rows)))
+
+    lines.append('</map>')
+
+    name = 'bench{0}x{1}x{2}{3}.tmx'.format(width, height, layers, suffix)
+    filename = os.path.join(directory, name)
+    with open(filename, 'w') as fp:
+        fp.write('\n'.join(lines))
+
+    return filename
+
+
+def load_map(*args, **kwargs):
+    """ Make a map with make_map and return it loaded with pytmx
+    """
+    import pytmx
+    return pytmx.load_pygame(make_map(*args, **kwargs))
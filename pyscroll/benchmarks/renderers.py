@@ -0,0 +1,230 @@
+"""
+Benchmark the renderers along scripted camera paths.
+
+Synthetic maps of several sizes, layer counts and kinds of transparency are
+drawn with BufferedRenderer and ThreadedRenderer while the camera follows a
+path.  Each frame centers the renderer, calls update() and draws the map, like
+a game loop.  The results are printed as JSON, one object per run:
+
+    tiles_per_second  tiles blitted by the renderer, per second of frames and
+                      the final flush that finishes the queued tiles
+    frame_p50_ms      median time of a frame
+    frame_p99_ms      99th percentile time of a frame
+    stalls            calls to flush() or flush_view() that took more than
+                      STALL_MS, and stall_ms is their total time
+    max_latency_ms    longest wait of a queued strip (ThreadedRenderer only)
+
+    python -m pyscroll.benchmarks.renderers [--quick] [--output file]
+"""
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+from timeit import default_timer
+
+from .maps import init_display, load_map
+
+SIZE = 480, 270
+FRAMES = 300
+STALL_MS = 1.0
+
+MAPS = [
+    # width, height, layers, transparency
+    (100, 100, 2, None),
+    (100, 100, 4, 'colorkey'),
+    (100, 100, 4, 'alpha'),
+    (400, 200, 4, 'colorkey'),
+]
+
+QUICK_MAPS = [
+    (60, 60, 2, None),
+    (60, 60, 3, 'colorkey'),
+]
+
+
+def slow_pan(bounds, frames):
+    """ Move the camera right and down by a few pixels each frame
+    """
+    x, y = bounds.left, bounds.top
+    for i in range(frames):
+        yield x + i * 2 % bounds.width, y + i % bounds.height
+
+
+def fast_run(bounds, frames):
+    """ Move the camera across the map by more than a tile each frame
+    """
+    x, y = bounds.left, bounds.centery
+    for i in range(frames):
+        yield x + i * 24 % bounds.width, y
+
+
+def teleport(bounds, frames, every=30, seed=0):
+    """ Move the camera slowly, and jump somewhere else now and then
+    """
+    rnd = random.Random(seed)
+    x, y = bounds.center
+    for i in range(frames):
+        if i % every == 0:
+            x = rnd.randrange(bounds.left, bounds.right)
+            y = rnd.randrange(bounds.top, bounds.bottom)
+        yield x + i % every * 2, y
+
+
+PATHS = [slow_pan, fast_run, teleport]
+
+
+def percentile(values, fraction):
+    """ Return the value at a fraction of a list of sorted values
+    """
+    return values[int(round(fraction * (len(values) - 1)))]
+
+
+class Probe(object):
+    """ Count the tiles blitted, and time the flushes, of a renderer
+
+    the methods are wrapped on the instance, so the renderer is unchanged.
+    flush is the original method, to finish the queue without being timed.
+    """
+
+    def __init__(self, renderer):
+        self.tiles = 0
+        self.stalls = 0
+        self.stall_time = 0.0
+        self.lock = threading.Lock()
+
+        blit_tiles = renderer.blit_tiles
+
+        def counted_blit_tiles(iterator, *args, **kwargs):
+            tiles = list(iterator)
+            with self.lock:
+                self.tiles += len(tiles)
+            return blit_tiles(tiles, *args, **kwargs)
+
+        renderer.blit_tiles = counted_blit_tiles
+        self.flush = renderer.flush
+        renderer.flush = self.timed(renderer.flush)
+        renderer.flush_view = self.timed(renderer.flush_view)
+
+    def timed(self, func):
+        def timed_func(*args, **kwargs):
+            start = default_timer()
+            result = func(*args, **kwargs)
+            elapsed = default_timer() - start
+            if elapsed * 1000 > STALL_MS:
+                self.stalls += 1
+                self.stall_time += elapsed
+            return result
+        return timed_func
+
+    def reset(self):
+        with self.lock:
+            self.tiles = 0
+        self.stalls = 0
+        self.stall_time = 0.0
+
+
+def run(renderer, path, frames):
+    """ Draw frames along a camera path and return the measurements
+    """
+    import pygame
+
+    surface = pygame.Surface(SIZE)
+    rect = surface.get_rect()
+
+    # camera positions are kept away from the edges of the map
+    data = renderer.data
+    bounds = pygame.Rect(0, 0, data.width * data.tilewidth,
+                         data.height * data.tileheight)
+    bounds.inflate_ip(-SIZE[0], -SIZE[1])
+    bounds.width = max(bounds.width, 1)
+    bounds.height = max(bounds.height, 1)
+    positions = list(path(bounds, frames))
+
+    renderer.center(positions[0])
+    renderer.redraw()
+    probe = Probe(renderer)
+    if hasattr(renderer, 'max_latency'):
+        renderer.max_latency = 0.0
+
+    times = list()
+    start = default_timer()
+    for position in positions:
+        t = default_timer()
+        renderer.center(position)
+        renderer.update(1000 / 60.0)
+        renderer.draw(surface, rect)
+        times.append(default_timer() - t)
+    probe.flush()
+    elapsed = default_timer() - start
+
+    times.sort()
+    result = {
+        'frames': frames,
+        'tiles': probe.tiles,
+        'tiles_per_second': round(probe.tiles / elapsed, 1),
+        'frame_p50_ms': round(percentile(times, .5) * 1000, 3),
+        'frame_p99_ms': round(percentile(times, .99) * 1000, 3),
+        'stalls': probe.stalls,
+        'stall_ms': round(probe.stall_time * 1000, 3),
+    }
+    if hasattr(renderer, 'max_latency'):
+        result['max_latency_ms'] = round(renderer.max_latency * 1000, 3)
+    return result
+
+
+def bench(maps, frames):
+    """ Run every renderer along every path on every map
+    """
+    import pyscroll
+
+    results = list()
+    for width, height, layers, transparency in maps:
+        tmx = load_map(width, height, layers=layers,
+                       colorkey=transparency == 'colorkey',
+                       alpha=transparency == 'alpha')
+        data = pyscroll.TiledMapData(tmx)
+        for cls, path in itertools.product(
+                (pyscroll.BufferedRenderer, pyscroll.ThreadedRenderer),
+                PATHS):
+            renderer = cls(data, SIZE, None, 2, True)
+            result = {
+                'renderer': cls.__name__,
+                'path': path.__name__,
+                'map': '{0}x{1}'.format(width, height),
+                'layers': layers,
+                'transparency': transparency or 'none',
+            }
+            result.update(run(renderer, path, frames))
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--quick', action='store_true',
+                        help='use small maps and fewer frames')
+    parser.add_argument('--frames', type=int, default=None,
+                        help='frames for each run (default {0})'.format(
+                            FRAMES))
+    parser.add_argument('--output', default=None,
+                        help='write the results to a file')
+    args = parser.parse_args(argv)
+
+    frames = args.frames or (60 if args.quick else FRAMES)
+    maps = QUICK_MAPS if args.quick else MAPS
+
+    init_display()
+    results = bench(maps, frames)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(text)
+    else:
+        sys.stdout.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark two cameras on the same map, like a split screen.
+
+Compares two renderers that each have their own caches with two renderers
+that share the tile stack, chunk and object caches.  The cameras follow
+each other a screen apart, so they draw mostly the same tiles.  Reports the
+time of each frame and the bytes held by the caches.
+
+    python -m pyscroll.benchmarks.splitscreen
+"""
+
+import timeit
+
+from .maps import init_display, load_map
+
+SIZE = 480, 135
+FRAMES = 300
+COLORKEY = 255, 0, 255
+
+
+def make_renderers(data, shared, chunked=False):
+    """ Return two renderers, with shared caches or their own
+    """
+    import pyscroll
+
+    caches = None
+    renderers = list()
+    for i in range(2):
+        if caches is None or not shared:
+            caches = (pyscroll.TileStackCache(data, COLORKEY, 1024),
+                      pyscroll.ChunkCache(), pyscroll.ChunkCache())
+        tile_cache, chunk_cache, object_cache = caches
+        if chunked:
+            renderer = pyscroll.ChunkedRenderer(
+                data, SIZE, COLORKEY, True, tile_cache,
+                chunk_cache=chunk_cache)
+        else:
+            renderer = pyscroll.BufferedRenderer(
+                data, SIZE, COLORKEY, 2, True, tile_cache)
+        renderer.object_cache = object_cache
+        renderers.append(renderer)
+    return renderers
+
+
+def cache_bytes(renderers):
+    """ Return the bytes held by the distinct caches of the renderers
+    """
+    from pyscroll.cache import surface_bytes
+
+    caches = dict()
+    for r in renderers:
+        caches[id(r.tile_cache)] = sum(
+            surface_bytes(i) for i in r.tile_cache._items.values())
+        if hasattr(r, 'chunk_cache'):
+            caches[id(r.chunk_cache)] = r.chunk_cache.size
+        caches[id(r.object_cache)] = r.object_cache.size
+    return sum(caches.values())
+
+
+def bench(renderers, frames=FRAMES):
+    """ Return the mean time to draw both cameras, in milliseconds
+    """
+    import pygame
+
+    surface = pygame.Surface((SIZE[0], SIZE[1] * 2))
+    rects = [pygame.Rect(0, 0, SIZE[0], SIZE[1]),
+             pygame.Rect(0, SIZE[1], SIZE[0], SIZE[1])]
+
+    def frame():
+        x = 300 + frame.count * 3
+        for i, (renderer, rect) in enumerate(zip(renderers, rects)):
+            renderer.center((x + i * SIZE[0] // 2, 400))
+            renderer.update(1000 / 60.0)
+            renderer.draw(surface, rect)
+        frame.count += 1
+    frame.count = 0
+
+    frame()
+    return timeit.timeit(frame, number=frames) / frames * 1000
+
+
+def main():
+    import pyscroll
+
+    init_display()
+    tmx = load_map(400, 60, layers=4, colorkey=True, densities=[.3, .1, .05])
+    data = pyscroll.TiledMapData(tmx)
+
+    print('two {0}x{1} cameras, {2} frames'.format(SIZE[0], SIZE[1], FRAMES))
+    for chunked in (False, True):
+        for shared in (False, True):
+            renderers = make_renderers(data, shared, chunked)
+            ms = bench(renderers)
+            print('{0:8} {1:7} {2:.3f} ms/frame, caches {3} KiB'.format(
+                'chunked' if chunked else 'buffered',
+                'shared' if shared else 'own', ms,
+                cache_bytes(renderers) // 1024))
+
+
+if __name__ == '__main__':
+    main()
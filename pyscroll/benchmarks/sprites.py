@@ -0,0 +1,113 @@
+"""
+Benchmark drawing a map with 200 sprites on screen.
+
+Measures BufferedRenderer.draw() with sprites that are covered by upper tile
+layers, and compares finding the covered cells with the old quadtree against
+the grid arithmetic that the renderer uses now.  Drawing is also measured
+with the overlay buffer, where sprites are covered without per-tile work.
+
+    python -m pyscroll.benchmarks.sprites
+"""
+
+import random
+import timeit
+from itertools import product
+
+from .maps import init_display, load_map
+
+SIZE = 480, 270
+SPRITES = 200
+FRAMES = 200
+
+
+def make_sprites(count, size, seed=0):
+    """ Return (image, rect, layer) tuples scattered over a view
+    """
+    import pygame
+
+    rnd = random.Random(seed)
+    image = pygame.Surface((16, 24))
+    image.fill((255, 255, 255))
+    surfaces = list()
+    for i in range(count):
+        rect = image.get_rect()
+        rect.topleft = rnd.randrange(size[0] - 16), rnd.randrange(size[1] - 24)
+        surfaces.append((image, rect, 0))
+    return surfaces
+
+
+def bench_draw(renderer, surfaces, frames=FRAMES):
+    """ Return the mean time to draw one frame, in milliseconds
+    """
+    import pygame
+
+    surface = pygame.Surface(SIZE)
+    rect = surface.get_rect()
+    x, y = renderer.rect.center
+
+    def frame():
+        renderer.center((x + frame.count % 64, y))
+        renderer.draw(surface, rect, surfaces)
+        frame.count += 1
+    frame.count = 0
+
+    frame()
+    return timeit.timeit(frame, number=frames) / frames * 1000
+
+
+def bench_lookup(renderer, surfaces, frames=FRAMES):
+    """ Return the mean time to find the covered cells of all sprites
+
+    returns a tuple of (quadtree, grid) times in milliseconds
+    """
+    import pygame
+    from pyscroll.quadtree import FastQuadTree
+
+    tw = renderer.data.tilewidth
+    th = renderer.data.tileheight
+    view = renderer.view
+    rects = [pygame.Rect(x * tw, y * th, tw, th)
+             for x, y in product(range(view.width), range(view.height))]
+    tree = FastQuadTree(rects, 1)
+    sprite_rects = [i[1] for i in surfaces]
+
+    def quadtree():
+        for r in sprite_rects:
+            for cell in tree.hit(r):
+                pass
+
+    def grid():
+        for r in sprite_rects:
+            for cell in product(range(r.left // tw, (r.right - 1) // tw + 1),
+                                range(r.top // th, (r.bottom - 1) // th + 1)):
+                pass
+
+    return (timeit.timeit(quadtree, number=frames) / frames * 1000,
+            timeit.timeit(grid, number=frames) / frames * 1000)
+
+
+def main():
+    import pyscroll
+
+    init_display()
+    tmx = load_map(200, 100, layers=4, colorkey=True,
+                   densities=[.5, .3, .1])
+    data = pyscroll.TiledMapData(tmx)
+    renderer = pyscroll.BufferedRenderer(data, SIZE, (255, 0, 255), 2)
+    surfaces = make_sprites(SPRITES, SIZE)
+
+    quadtree, grid = bench_lookup(renderer, surfaces)
+    print('{0} sprites, {1}x{2} view'.format(SPRITES, *SIZE))
+    print('cell lookup, quadtree: {0:.3f} ms/frame'.format(quadtree))
+    print('cell lookup, grid:     {0:.3f} ms/frame'.format(grid))
+    print('draw:                  {0:.3f} ms/frame'.format(
+        bench_draw(renderer, surfaces)))
+
+    renderer = pyscroll.BufferedRenderer(data, SIZE, (255, 0, 255), 2,
+                                         overlay_layer=0)
+    print('draw, overlay:         {0:.3f} ms/frame'.format(
+        bench_draw(renderer, surfaces)))
+
+
+if __name__ == '__main__':
+    main()
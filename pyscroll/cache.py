@@ -0,0 +1,147 @@
+"""
+Caches used by the renderers.
+
+Tile stacks (all the gids at one map cell) are composited into a single
+surface and kept in a small LRU cache.  Most maps only use a few different
+stacks, so each cell can be drawn with one blit instead of one per layer.
+
+Chunks are larger pre-rendered pieces of the map, used by the
+ChunkedRenderer.  They are kept in a cache with a budget in bytes.
+"""
+
+import pygame
+import threading
+from collections import OrderedDict
+
+__all__ = ['LRUCache', 'TileStackCache', 'ChunkCache']
+
+
+class LRUCache(object):
+    """ Mapping that discards the least recently used items
+
+    The size of each item is measured with sizeof, which counts each item
+    as 1 if not set.  When the total size is larger than max_size, the oldest
+    items are removed.  The cache can be shared between threads.
+    """
+
+    def __init__(self, max_size=256, sizeof=None):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """ Return the item for key and mark it as recently used
+        """
+        with self.lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._items[key] = value
+            return value
+
+    def put(self, key, value):
+        """ Store an item, evicting the oldest items if needed
+        """
+        with self.lock:
+            self.discard(key)
+            self._items[key] = value
+            self.size += self.measure(value)
+            while self.size > self.max_size and len(self._items) > 1:
+                old_key, old_value = self._items.popitem(last=False)
+                self.size -= self.measure(old_value)
+
+    def discard(self, key):
+        """ Remove an item if it is stored
+        """
+        with self.lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return
+            self.size -= self.measure(value)
+
+    def oldest(self):
+        """ Return the key of the least recently used item, or None
+        """
+        with self.lock:
+            return next(iter(self._items), None)
+
+    def measure(self, value):
+        if self.sizeof is None:
+            return 1
+        return self.sizeof(value)
+
+    def clear(self):
+        with self.lock:
+            self._items.clear()
+            self.size = 0
+
+
+class TileStackCache(LRUCache):
+    """ LRU cache of composited tile stacks
+
+    A stack is the tuple of gids found at one cell, in layer order.  The
+    composite is never given a colorkey, so blitting it will replace every
+    pixel of the cell, including the ones set to the colorkey.
+    """
+
+    def __init__(self, data, colorkey=None, max_size=256):
+        LRUCache.__init__(self, max_size)
+        self.data = data
+        self.colorkey = colorkey
+
+    def get_image(self, gids):
+        """ Return a surface with the tiles of each gid drawn in order
+        """
+        image = self.get(gids)
+        if image is None:
+            image = self.composite(gids)
+            self.put(gids, image)
+        return image
+
+    def composite(self, gids):
+        """ Draw the tiles of a stack onto a new surface
+        """
+        get_image = self.data.get_tile_image_by_gid
+        image = pygame.Surface((self.data.tilewidth, self.data.tileheight))
+        if self.colorkey:
+            image.fill(self.colorkey)
+
+        for gid in gids:
+            if gid:
+                tile = get_image(gid)
+                if tile:
+                    image.blit(tile, (0, 0))
+
+        return image
+
+
+def surface_bytes(surface):
+    """ Return the number of bytes used by the pixels of a surface
+    """
+    w, h = surface.get_size()
+    return w * h * surface.get_bytesize()
+
+
+class ChunkCache(LRUCache):
+    """ LRU cache of pre-rendered map chunks with a budget in bytes
+
+    Chunks are keyed by their rect in map pixels, as a (x, y, w, h) tuple.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        LRUCache.__init__(self, max_bytes, surface_bytes)
@@ -0,0 +1,395 @@
+"""
+Renderer that draws the map from large, pre-rendered chunks.
+"""
+
+import math
+import pygame
+from six.moves import range
+from .pyscroll import BufferedRenderer
+from .cache import ChunkCache
+
+__all__ = ['ChunkedRenderer']
+
+
+class ChunkedRenderer(BufferedRenderer):
+    """ Renderer that composes the view from pre-rendered chunks
+
+    The map is rendered in fixed-size chunks that are kept in a LRU cache with
+    a budget in bytes.  A chunk is rendered when it is first needed, and
+    update() will render the chunks around the view ahead of time.  The view
+    is drawn by blitting each chunk that it overlaps, so when the chunks are
+    at least as large as the view, it will never take more than four blits.
+
+    Unlike the BufferedRenderer, the whole view is not redrawn after a resize
+    or when the camera jumps, as long as the chunks are still cached.  Pass
+    the same chunk_cache to new renderers to keep the chunks between them.
+
+    If chunk_size is not set, the chunks will be the size of the view, but
+    not smaller than 256x256.  Chunk sizes are rounded up to whole tiles.
+
+    When animated tiles change frames, the cached chunks are not redrawn
+    right away.  The animated cells of a chunk are drawn again when the chunk
+    is next used.  Tiles changed in the data are drawn again on every cached
+    chunk that has them.
+    """
+
+    def __init__(self, data, size, colorkey=None, clamp_camera=False,
+                 tile_cache=None, chunk_size=None, chunk_cache=None):
+
+        # default options
+        self.chunk_size = chunk_size
+        self.chunks_per_update = 1
+
+        # internal defaults
+        self.view_rect = None
+        self.animation_serial = 0
+        self.chunk_serials = dict()
+        self.chunk_animations = dict()
+
+        if chunk_cache is None:
+            chunk_cache = ChunkCache()
+        self.chunk_cache = chunk_cache
+
+        BufferedRenderer.__init__(self, data, size, colorkey, 0,
+                                  clamp_camera, tile_cache)
+
+    def set_size(self, size):
+        """ Set the size of the map in pixels
+        """
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+
+        if self.chunk_size is None:
+            self.chunk_size = max(size[0], 256), max(size[1], 256)
+
+        cw, ch = self.chunk_size
+        self.chunk_size = (int(math.ceil(cw / float(tw))) * tw,
+                           int(math.ceil(ch / float(th))) * th)
+
+        self.create_parallax_renderers(size)
+
+        # this is the pixel size of the entire map
+        self.rect = pygame.Rect(0, 0,
+                                self.data.width * tw,
+                                self.data.height * th)
+
+        self.half_width = size[0] / 2
+        self.half_height = size[1] / 2
+
+        self.size = size
+        self.idle = False
+        self.blank = True
+        self.old_x = 0
+        self.old_y = 0
+        self.view_rect = pygame.Rect((0, 0), size)
+        self.view_rect.center = 0, 0
+
+    def resize(self, size):
+        """ Change the size of the view
+
+        The chunks are cached, so only the view is changed, and the parallax
+        groups are resized the same way as by BufferedRenderer.resize.  The
+        map stays centered on the same pixel, unless the camera is clamped.
+        """
+        self.half_width = size[0] / 2
+        self.half_height = size[1] / 2
+        self.size = size
+        self.view_rect.size = size
+
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.resize(size)
+
+        x, y = self.clamp_center((self.old_x, self.old_y))
+        self.center_parallax(x, y)
+        self.place_view(x, y)
+
+    def center(self, coords):
+        """ center the map on a pixel
+        """
+        x, y = self.clamp_center(coords)
+        self.center_parallax(x, y)
+
+        if self.old_x == x and self.old_y == y:
+            self.idle = True
+            return
+
+        self.place_view(x, y)
+
+    def place_view(self, x, y):
+        """ Move the view to center the map on a pixel
+        """
+        self.idle = False
+        self.view_rect.topleft = (int(math.floor(x - self.half_width)),
+                                  int(math.floor(y - self.half_height)))
+        self.old_x, self.old_y = x, y
+
+    def get_chunk_keys(self, rect):
+        """ Return the keys of the chunks that overlap a rect in map pixels
+        """
+        cw, ch = self.chunk_size
+        for cy in range(rect.top // ch, (rect.bottom - 1) // ch + 1):
+            for cx in range(rect.left // cw, (rect.right - 1) // cw + 1):
+                yield cx * cw, cy * ch, cw, ch
+
+    def get_chunk(self, key):
+        """ Return the chunk surface for a key, rendering it if needed
+        """
+        chunk = self.chunk_cache.get(key)
+        if chunk is None:
+            chunk = self.render_chunk(key)
+            self.chunk_cache.put(key, chunk)
+        elif self.chunk_serials.get(key) != self.animation_serial:
+            self.redraw_chunk_animations(key, chunk)
+        return chunk
+
+    def render_chunk(self, key):
+        """ Render the tiles and objects of a chunk onto a new surface
+        """
+        x, y, w, h = key
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        chunk = pygame.Surface((w, h))
+        blit = chunk.blit
+
+        if self.colorkey:
+            chunk.fill(self.colorkey)
+            chunk.set_colorkey(self.colorkey)
+
+        left = x // tw
+        top = y // th
+        xs = range(left, left + w // tw)
+        ys = range(top, top + h // th)
+        layers = tuple(self.data.visible_tile_layers)
+
+        if self.tile_cache is not None:
+            get_stack = self.get_tile_stack_image
+            for ty in ys:
+                for tx in xs:
+                    blit(get_stack((tx, ty), layers),
+                         ((tx - left) * tw, (ty - top) * th))
+        else:
+            get_tile = self.get_tile_image
+            cells = pygame.Rect(left, top, len(xs), len(ys))
+            for tx, ty, l in self.get_region_tiles(cells):
+                tile = get_tile((tx, ty, l))
+                if tile:
+                    blit(tile, ((tx - left) * tw, (ty - top) * th))
+
+        self.draw_objects(chunk, (x, y))
+        self.chunk_serials[key] = self.animation_serial
+        return chunk
+
+    def redraw_animated_tiles(self, gids):
+        """ Mark the animated cells of every chunk as out of date
+        """
+        self.animation_serial += 1
+
+    def get_chunk_animations(self, key):
+        """ Return the (x, y) cells of a chunk that have animated tiles
+        """
+        cells = self.chunk_animations.get(key)
+        if cells is None:
+            x, y, w, h = key
+            tw = self.data.tilewidth
+            th = self.data.tileheight
+            area = pygame.Rect(x // tw, y // th, w // tw, h // th)
+            layers = set(self.data.visible_tile_layers)
+            locations = self.data.animation_locations
+            cells = sorted(set((tx, ty) for gid in self.data.animations
+                               for tx, ty, l in locations.get(gid, ())
+                               if l in layers and area.collidepoint(tx, ty)))
+            self.chunk_animations[key] = cells
+        return cells
+
+    def redraw_cells(self, tiles):
+        """ Draw the cells of (x, y, layer) tiles again on the cached chunks
+
+        if tiles is None, every chunk is rendered again.
+        """
+        if tiles is None:
+            self.chunk_cache.clear()
+            self.chunk_animations = dict()
+            self.chunk_serials = dict()
+            self.buffer_changed = True
+            return
+
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        layers = set(self.data.visible_tile_layers)
+        keys = dict()
+        for x, y, l in tiles:
+            if l in layers:
+                cell = pygame.Rect(x * tw, y * th, tw, th)
+                for key in self.get_chunk_keys(cell):
+                    keys.setdefault(key, set()).add((x, y))
+
+        for key, cells in keys.items():
+            self.chunk_animations.pop(key, None)
+            chunk = self.chunk_cache.get(key)
+            if chunk is not None:
+                self.redraw_chunk_cells(key, chunk, cells)
+                if self.cells_in_view(cells):
+                    self.buffer_changed = True
+
+    def redraw_chunk_animations(self, key, chunk):
+        """ Draw the animated cells of a chunk with the current frames
+        """
+        cells = self.get_chunk_animations(key)
+        self.redraw_chunk_cells(key, chunk, cells)
+        self.chunk_serials[key] = self.animation_serial
+        if self.cells_in_view(cells):
+            self.buffer_changed = True
+
+    def cells_in_view(self, cells):
+        """ Return True if any of the (x, y) cells overlaps the view
+        """
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        collide = self.view_rect.colliderect
+        return any(collide((x * tw, y * th, tw, th)) for x, y in cells)
+
+    def redraw_chunk_cells(self, key, chunk, cells):
+        """ Draw (x, y) cells of a chunk again
+        """
+        x, y, w, h = key
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        left = x // tw
+        top = y // th
+        blit = chunk.blit
+        fill_color = self.colorkey if self.colorkey else (0, 0, 0)
+        layers = tuple(self.data.visible_tile_layers)
+        get_tile = self.get_tile_image
+        get_stack = self.get_tile_stack_image
+
+        for tx, ty in cells:
+            position = (tx - left) * tw, (ty - top) * th
+            chunk.fill(fill_color, (position, (tw, th)))
+            if self.tile_cache is not None:
+                blit(get_stack((tx, ty), layers), position)
+            else:
+                for l in layers:
+                    tile = get_tile((tx, ty, l))
+                    if tile:
+                        blit(tile, position)
+            self.draw_objects(chunk, (x, y),
+                              pygame.Rect(tx * tw, ty * th, tw, th))
+
+    def update(self, dt=None):
+        """ Render chunks next to the view ahead of time
+
+        At most chunks_per_update chunks are rendered for each call, and
+        only as many as fit in the cache budget with the chunks of the view.
+        """
+        self.update_parallax(dt)
+        self.update_animations(dt)
+        self.update_tile_changes()
+
+        cw, ch = self.chunk_size
+        cache = self.chunk_cache
+        remaining = self.chunks_per_update
+        chunk_bytes = cw * ch * pygame.Surface((1, 1)).get_bytesize()
+
+        # the chunks of the view come first, then the nearest ones around it,
+        # as many as fit in the cache.  prefetching never evicts them.
+        view = list(self.get_chunk_keys(self.view_rect))
+        around = self.view_rect.inflate(cw * 2, ch * 2)
+        wanted = view + [key for key in self.sort_chunk_keys(
+            self.get_chunk_keys(around)) if key not in view and
+            self.rect.colliderect(key)]
+        wanted = wanted[:max(cache.max_size // chunk_bytes, len(view))]
+        keep = set(wanted)
+
+        for key in wanted:
+            if remaining <= 0:
+                break
+            if key in cache:
+                continue
+            while cache.size + chunk_bytes > cache.max_size:
+                oldest = cache.oldest()
+                if oldest is None or oldest in keep:
+                    return
+                cache.discard(oldest)
+            cache.put(key, self.render_chunk(key))
+            remaining -= 1
+
+    def sort_chunk_keys(self, keys):
+        """ Return a list of chunk keys, nearest to the view first
+        """
+        cx, cy = self.view_rect.center
+        return sorted(keys, key=lambda k: abs(k[0] + k[2] / 2 - cx) +
+                      abs(k[1] + k[3] / 2 - cy))
+
+    def prerender(self):
+        """ Render the chunks of the map, nearest to the view first
+
+        Stops when the next chunk would not fit in the cache budget.
+        """
+        cache = self.chunk_cache
+        for key in self.sort_chunk_keys(self.get_chunk_keys(self.rect)):
+            if key in cache:
+                continue
+            chunk = self.render_chunk(key)
+            if cache.size + cache.measure(chunk) > cache.max_size:
+                break
+            cache.put(key, chunk)
+
+    def flush(self):
+        """ Render every chunk that overlaps the view
+        """
+        for key in self.get_chunk_keys(self.view_rect):
+            self.get_chunk(key)
+        self.blank = False
+
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.flush()
+
+    def redraw(self):
+        """ Discard the chunks in the view and render them again
+        """
+        for key in self.get_chunk_keys(self.view_rect):
+            self.chunk_cache.discard(key)
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.redraw()
+        self.flush()
+
+    def draw(self, surface, rect, surfaces=None):
+        """ Draw the map onto a surface
+
+        Works the same as BufferedRenderer.draw.
+        """
+        redrawn = self.blank
+        self.update_tile_changes()
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.update_tile_changes()
+
+        surblit = surface.blit
+        left, top = self.view_rect.topleft
+        ox = rect.left - left
+        oy = rect.top - top
+
+        original_clip = None
+        if self.clipping:
+            original_clip = surface.get_clip()
+            surface.set_clip(rect)
+
+        if self.parallax_renderers:
+            redrawn |= self.draw_parallax(surface, rect, True)
+
+        for key in self.get_chunk_keys(self.view_rect):
+            surblit(self.get_chunk(key), (key[0] + ox, key[1] + oy))
+        self.blank = False
+        redrawn |= self.take_buffer_changed()
+
+        if surfaces is None:
+            dirty = list()
+        else:
+            dirty = self.draw_surfaces(surface, surfaces, (ox, oy))
+
+        if self.parallax_renderers:
+            redrawn |= self.draw_parallax(surface, rect, False)
+
+        if self.clipping:
+            surface.set_clip(original_clip)
+
+        return self.get_dirty_rects(rect, [i[0] for i in dirty], redrawn)
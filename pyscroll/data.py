@@ -1,27 +1,164 @@
 """
-This file contains two data classes for use with pytmx.
+This file contains two data classes for use with pytmx, and a class to
+use some of the tile layers of another data class.
 """
 
+import re
 import sys
 import pytmx
 
-__all__ = ['TiledMapData']
+__all__ = ['TiledMapData', 'LayerGroupData']
 
 
 class TiledMapData(object):
     """ For PyTMX 3.x and 6.x
+
+    If the images of the map were scaled by the loader, the tile size is
+    scaled by the same factor, so the map is rendered at that scale.  Object
+    coordinates are not scaled; the renderers multiply them by scale.
+
+    The cells that have tiles are indexed when the data is created, so the
+    renderers can skip the empty cells of sparse layers, and find the cells
+    of animated tiles.  See index_tiles.
     """
 
     def __init__(self, tmx):
         self.tmx = tmx
+        self.occupancy = dict()
+        self.tile_runs = dict()
+        self.animations = dict()
+        self.animation_locations = dict()
+        self.indexed_serial = 0
+        self.index_tiles()
+
+    def index_tiles(self):
+        """ Build the indexes of the tile layers
+
+        occupancy[layer] is a bytearray with a byte for each cell, row by
+        row, that is 1 if the cell has a tile.  tile_runs[layer][y] is a list
+        of (start, stop) ranges of x in row y that have tiles.
+
+        animations maps the gid of each animated tile to a list of
+        (gid, duration) frames, and animation_locations maps it to a list of
+        the (x, y, layer) cells where it is used.
+
+        Only the visible layers are indexed.  Call this again after showing
+        a hidden layer, so its animated tiles are found.
+        """
+        self.occupancy = dict()
+        self.tile_runs = dict()
+        self.animations = dict()
+        self.animation_locations = dict()
+        self.indexed_serial = self.tile_change_serial
+
+        for gid, props in self.tmx.tile_properties.items():
+            frames = props.get('frames')
+            if frames:
+                self.animations[gid] = [(f.gid, f.duration) for f in frames]
+        animated = set(self.animations)
+
+        find_runs = re.compile(b'\x01+').finditer
+        for index, layer in enumerate(self.tmx.layers):
+            # hidden layers are not drawn, and lazy ones are not decoded
+            if not isinstance(layer, pytmx.TiledTileLayer) or \
+                    not layer.visible:
+                continue
+
+            # with a gid index, the animated tiles are found without a scan
+            gid_index = getattr(layer, 'gid_index', None)
+            if gid_index is not None:
+                for gid in animated.intersection(gid_index):
+                    self.animation_locations.setdefault(gid, list()).extend(
+                        (x, y, index)
+                        for x, y in layer.get_tile_locations_by_gid(gid))
+
+            bitmap = bytearray()
+            runs = list()
+            for y, row in enumerate(layer.data):
+                if gid_index is None and animated and \
+                        not animated.isdisjoint(row):
+                    for x, gid in enumerate(row):
+                        if gid in animated:
+                            self.animation_locations.setdefault(
+                                gid, list()).append((x, y, index))
+
+                row = bytearray(1 if gid else 0 for gid in row)
+                bitmap.extend(row)
+                runs.append([m.span() for m in find_runs(row)])
+
+            self.occupancy[index] = bitmap
+            self.tile_runs[index] = runs
+
+    @property
+    def tile_change_serial(self):
+        return self.tmx.tile_change_serial
+
+    def get_tile_changes(self, serial):
+        """ Return the (x, y, layer) tiles changed since a serial number
+
+        Returns None if the changes are not known, and everything must be
+        drawn again.  The indexes are updated for the changes first.
+        """
+        self.update_index()
+        return self.tmx.get_tile_changes(serial)
+
+    def update_index(self):
+        """ Update the indexes for the tiles changed since they were built
+        """
+        changes = self.tmx.get_tile_changes(self.indexed_serial)
+        if changes is None:
+            self.index_tiles()
+            return
+        if not changes:
+            return
+
+        self.indexed_serial = self.tile_change_serial
+        find_runs = re.compile(b'\x01+').finditer
+        width = self.width
+        rows = set()
+        for x, y, l in changes:
+            bitmap = self.occupancy.get(l)
+            if bitmap is None:
+                continue
+
+            gid = self.tmx.get_tile_gid(x, y, l)
+            bitmap[y * width + x] = 1 if gid else 0
+            rows.add((l, y))
+
+            for locations in self.animation_locations.values():
+                if (x, y, l) in locations:
+                    locations.remove((x, y, l))
+            if gid in self.animations:
+                self.animation_locations.setdefault(
+                    gid, list()).append((x, y, l))
+
+        for l, y in rows:
+            row = self.occupancy[l][y * width:(y + 1) * width]
+            self.tile_runs[l][y] = [m.span() for m in find_runs(row)]
+
+    def get_tile_runs(self, layer, y):
+        """ Return a list of (start, stop) ranges of x that have tiles
+
+        If the layer is not indexed, the whole row is returned.
+        """
+        runs = self.tile_runs.get(layer)
+        if runs is None:
+            return [(0, self.width)]
+        if 0 <= y < len(runs):
+            return runs[y]
+        return []
+
+    @property
+    def scale(self):
+        return getattr(self.tmx, 'image_scale', 1)
 
     @property
     def tilewidth(self):
-        return self.tmx.tilewidth
+        return self.tmx.tilewidth * self.scale
 
     @property
     def tileheight(self):
-        return self.tmx.tileheight
+        return self.tmx.tileheight * self.scale
 
     @property
     def width(self):
@@ -53,16 +190,52 @@ class TiledMapData(object):
         x, y, l = position
         return self.tmx.get_tile_image(x, y, l)
 
+    def get_tile_gid(self, position):
+        """ Return the gid for this position.
+
+        Raises ValueError if the position is outside the map.
+        position is x, y, layer tuple
+        """
+        x, y, l = position
+        return self.tmx.get_tile_gid(x, y, l)
+
     def get_tile_image_by_gid(self, gid):
         """ Return surface for a gid (experimental)
         """
         return self.tmx.get_tile_image_by_gid(gid)
 
+    def get_layer_parallax(self, layer):
+        """ Return the x, y parallax factors of a layer
+
+        The factors are read from the parallaxx and parallaxy attributes
+        of the layer, or from the parallax, parallax_x or parallax_y
+        properties.  1.0 scrolls with the map, less is further away.
+        """
+        layer = self.tmx.layers[layer]
+        factor = getattr(layer, 'parallax', 1.0)
+        x = getattr(layer, 'parallaxx', getattr(layer, 'parallax_x', factor))
+        y = getattr(layer, 'parallaxy', getattr(layer, 'parallax_y', factor))
+        return float(x), float(y)
+
 
 class LegacyTiledMapData(TiledMapData):
     """ For PyTMX 2.x series
     """
 
+    def index_tiles(self):
+        """ Layers are not indexed with the legacy api
+        """
+        pass
+
+    @property
+    def tile_change_serial(self):
+        return 0
+
+    def get_tile_changes(self, serial):
+        """ Tiles cannot be changed with the legacy api
+        """
+        return []
+
     @property
     def visible_layers(self):
         return (int(i) for (i, l) in enumerate(self.tmx.all_layers)
@@ -85,11 +258,56 @@ class LegacyTiledMapData(TiledMapData):
         x, y, l = position
         return self.tmx.getTileImage(x, y, l)
 
+    def get_tile_gid(self, position):
+        """ Return the gid for this position.
+
+        Raises ValueError if the position is outside the map.
+        position is x, y, layer tuple
+        """
+        x, y, l = position
+        return self.tmx.getTileGID(x, y, l)
+
     def get_tile_image_by_gid(self, gid):
         """ Return surface for a gid (experimental)
         """
         return self.tmx.getTileImageByGid(gid)
 
+    def get_layer_parallax(self, layer):
+        """ Parallax is not supported with the legacy api
+        """
+        return 1.0, 1.0
+
+
+class LayerGroupData(object):
+    """ Data that only has some of the tile layers of another data object
+
+    Used by the renderers to draw parallax groups.  Everything else is
+    taken from the wrapped data.  If objects is false, there are no object
+    layers.  The layers of a group scroll together, so the parallax factors
+    of every layer are 1.0.
+    """
+
+    def __init__(self, data, layers, objects=True):
+        self.data = data
+        self.layers = tuple(layers)
+        self.objects = objects
+
+    def __getattr__(self, item):
+        return getattr(self.data, item)
+
+    @property
+    def visible_tile_layers(self):
+        return iter(self.layers)
+
+    @property
+    def visible_object_layers(self):
+        if self.objects:
+            return self.data.visible_object_layers
+        return iter(())
+
+    def get_layer_parallax(self, layer):
+        return 1.0, 1.0
+
 
 try:
     if getattr(pytmx, "__version__", (0, 0, 0)) < (2, 18, 0):
@@ -2,9 +2,14 @@ import pygame
 import pygame.gfxdraw
 import math
 import threading
+from timeit import default_timer
 from itertools import islice, product, chain
 from six.moves import queue, range
-from . import quadtree
+from .cache import TileStackCache, ChunkCache
+from .data import LayerGroupData
+
+# used for the overlay and object chunks if the renderer has no colorkey
+DEFAULT_COLORKEY = (255, 0, 255)
 
 
 class BufferedRenderer(object):
@@ -23,19 +28,57 @@ class BufferedRenderer(object):
     The buffered renderer must be used with a data class to get tile and shape
     information.  See the data class api in pyscroll.data, or use the built in
     pytmx support.
+
+    If a pyscroll.cache.TileStackCache is passed as tile_cache, all the layers
+    of a cell are composited into one cached surface and drawn with one blit.
+    Cells are then queued once, with a layer of None, instead of per layer.
+
+    If overlay_layer is set, the tiles of layers above it are also drawn to a
+    second buffer, the overlay.  Surfaces passed to draw() are then covered by
+    blitting the overlay over them, instead of blitting each tile above the
+    surface again.  The layers of the surfaces are not used in this mode; all
+    of them are treated as being on overlay_layer.
+
+    When prefetch is enabled, the buffer is shifted so that most of the
+    padding is ahead of the camera while it moves, and the tiles queued for
+    the padding are left for update() to draw.  draw() only blits the queued
+    tiles that are in view.  prefetch_hits counts the tiles drawn ahead of
+    time by update(), and prefetch_misses the tiles that draw() had to blit
+    because they were already in view.  If there are many misses, increase
+    the padding or call update() more often.
+
+    Tile layers with parallax factors other than 1.0 (see the data class)
+    are grouped by factor, and each group is drawn by its own renderer with
+    its own scrolled buffer.  Groups below every other tile layer are drawn
+    behind the map, so the map needs a colorkey to show them.  Other groups
+    are drawn in front of the map and the surfaces.
+
+    Animated tiles are advanced by the time passed to update(), in
+    milliseconds.  When the frame of an animated tile changes, only the
+    cells of the buffer where it is used are drawn again.  Tiles changed
+    with TiledMap.set_tile_gid are found in the change journal of the map
+    by update() and draw(), and their cells are drawn again the same way.
     """
     def __init__(self, data, size, colorkey=None, padding=4,
-                 clamp_camera=False):
+                 clamp_camera=False, tile_cache=None, overlay_layer=None):
 
         # default options
         self.colorkey = colorkey
+        self.tile_cache = tile_cache
+        self.overlay_layer = overlay_layer
+        self.transparent_colorkey = colorkey if colorkey else DEFAULT_COLORKEY
         self.padding = padding
         self.clamp_camera = clamp_camera
         self.clipping = True
         self.flush_on_draw = True
         self.update_rate = 25
+        self.update_budget = 1000
+        self.prefetch = True
+        self.prefetch_threshold = 1
         self.default_shape_texture_gid = 1
         self.default_shape_color = (0, 255, 0)
+        self.object_chunk_size = 16, 16
+        self.object_cache = ChunkCache()
 
         # internal defaults
         self.idle = False
@@ -48,10 +91,27 @@ class BufferedRenderer(object):
         self.old_y = None
         self.default_image = None
         self.buffer = None
+        self.overlay = None
+        self.overlay_cache = None
+        self.object_index = None
+        self.object_areas = list()
+        self.parallax_groups = list()
+        self.parallax_renderers = list()
         self.rect = None
         self.view = None
         self.half_width = None
         self.half_height = None
+        self.buffer_changed = False
+        self._drawn_center = None
+        self._drawn_rect = None
+        self._drawn_surfaces = list()
+        self.tile_cost = None
+        self.velocity = 0, 0
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+        self.animation_time = 0
+        self.animation_gids = dict()
+        self.tile_change_serial = 0
 
         self.lock = threading.Lock()
         self.set_data(data)
@@ -60,7 +120,48 @@ class BufferedRenderer(object):
 
     def set_data(self, data):
         self.data = data
+        self.set_parallax_groups()
         self.generate_default_image()
+        self.reset_objects()
+        self.animation_time = 0
+        self.animation_gids = dict()
+        self.set_animation_frames()
+        self.tile_change_serial = getattr(data, 'tile_change_serial', 0)
+
+    def set_parallax_groups(self):
+        """ Move tile layers with parallax factors into their own groups
+
+        the data is replaced with a LayerGroupData that only has the layers
+        that scroll with the map.
+        """
+        get_parallax = getattr(self.data, 'get_layer_parallax', None)
+        if get_parallax is None:
+            return
+
+        groups = dict()
+        for layer in self.data.visible_tile_layers:
+            groups.setdefault(get_parallax(layer), list()).append(layer)
+
+        map_layers = groups.pop((1.0, 1.0), list())
+        if not groups:
+            return
+
+        self.parallax_groups = list()
+        for factor, layers in sorted(groups.items(), key=lambda i: i[1][0]):
+            group = LayerGroupData(self.data, layers, False)
+            below = not map_layers or layers[-1] < map_layers[0]
+            self.parallax_groups.append((factor, group, below))
+
+        self.data = LayerGroupData(self.data, map_layers)
+
+    def create_parallax_renderers(self, size):
+        """ Make a renderer for each parallax group
+        """
+        self.parallax_renderers = list()
+        for factor, group, below in self.parallax_groups:
+            renderer = BufferedRenderer(group, size, self.transparent_colorkey,
+                                        max(self.padding, 2))
+            self.parallax_renderers.append((factor, renderer, below))
 
     def set_size(self, size):
         """ Set the size of the map in pixels
@@ -68,17 +169,8 @@ class BufferedRenderer(object):
         tw = self.data.tilewidth
         th = self.data.tileheight
 
-        buffer_width = size[0] + tw * self.padding
-        buffer_height = size[1] + th * self.padding
-        self.buffer = pygame.Surface((buffer_width, buffer_height))
-
-        self.view = pygame.Rect(0, 0,
-                                math.ceil(buffer_width / tw),
-                                math.ceil(buffer_height / th))
-
-        if self.colorkey:
-            self.buffer.set_colorkey(self.colorkey)
-            self.buffer.fill(self.colorkey)
+        self.create_buffers(size)
+        self.create_parallax_renderers(size)
 
         # this is the pixel size of the entire map
         self.rect = pygame.Rect(0, 0,
@@ -88,17 +180,6 @@ class BufferedRenderer(object):
         self.half_width = size[0] / 2
         self.half_height = size[1] / 2
 
-        # quadtree is used to correctly draw tiles that cover 'sprites'
-        def make_rect(x, y):
-            return pygame.Rect((x * tw, y * th), (tw, th))
-
-        rects = [make_rect(x, y)
-                 for x, y in product(range(self.view.width),
-                                     range(self.view.height))]
-
-        # TODO: figure out what depth -actually- does
-        self.layer_quadtree = quadtree.FastQuadTree(rects, 1)
-
         self.size = size
         self.idle = False
         self.blank = True
@@ -107,6 +188,90 @@ class BufferedRenderer(object):
         self.old_x = 0
         self.old_y = 0
 
+    def resize(self, size):
+        """ Change the size of the view, and keep what was drawn
+
+        The part of the old buffer that is still in the view is copied to the
+        new buffer, and only the cells that were not drawn are queued.  The
+        map stays centered on the same pixel, unless the camera is clamped.
+        """
+        if self.buffer is None or self.blank:
+            self.set_size(size)
+            return
+
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+
+        with self.lock:
+            old_buffer = self.buffer
+            old_overlay = self.overlay
+            left, top = self.view.topleft
+            self.create_buffers(size)
+            self.view.topleft = left, top
+            self.buffer.blit(old_buffer, (0, 0))
+            if old_overlay is not None and self.overlay is not None:
+                self.overlay.blit(old_overlay, (0, 0))
+
+        # the last column and row of the old buffer may be partly drawn
+        kept = pygame.Rect(left, top, old_buffer.get_width() // tw,
+                           old_buffer.get_height() // th)
+        view = self.view
+        exposed = list()
+        if view.right > kept.right:
+            exposed.append(pygame.Rect(kept.right, view.top,
+                                       view.right - kept.right, view.height))
+        if view.bottom > kept.bottom:
+            right = min(view.right, kept.right)
+            exposed.append(pygame.Rect(view.left, kept.bottom,
+                                       right - view.left,
+                                       view.bottom - kept.bottom))
+        self.queue_regions(exposed)
+
+        self.half_width = size[0] / 2
+        self.half_height = size[1] / 2
+        self.size = size
+
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.resize(size)
+
+        x, y = self.clamp_center((self.old_x, self.old_y))
+        self.center_parallax(x, y)
+        self.place_view(x, y)
+
+    def create_buffers(self, size):
+        """ Make the buffer, and the overlay, for a size of view
+
+        the view is placed at the top left of the map.
+        """
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+
+        buffer_width = size[0] + tw * self.padding
+        buffer_height = size[1] + th * self.padding
+        self.buffer = pygame.Surface((buffer_width, buffer_height))
+
+        self.view = pygame.Rect(0, 0,
+                                math.ceil(buffer_width / tw),
+                                math.ceil(buffer_height / th))
+
+        if self.colorkey:
+            self.buffer.set_colorkey(self.colorkey)
+            self.buffer.fill(self.colorkey)
+
+        if self.overlay_layer is not None:
+            self.overlay = pygame.Surface((buffer_width, buffer_height))
+            self.overlay.set_colorkey(self.transparent_colorkey)
+            self.overlay.fill(self.transparent_colorkey)
+
+            # composites for the overlay must be filled with its colorkey
+            if self.tile_cache is not None:
+                if self.tile_cache.colorkey == self.transparent_colorkey:
+                    self.overlay_cache = self.tile_cache
+                else:
+                    self.overlay_cache = TileStackCache(
+                        self.data, self.transparent_colorkey,
+                        self.tile_cache.max_size)
+
     def generate_default_image(self):
         self.default_image = pygame.Surface((self.data.tilewidth,
                                              self.data.tileheight))
@@ -114,17 +279,54 @@ class BufferedRenderer(object):
 
     def get_tile_image(self, position):
         try:
+            if self.animation_gids:
+                gid = self.data.get_tile_gid(position)
+                gid = self.animation_gids.get(gid, gid)
+                return self.data.get_tile_image_by_gid(gid)
             return self.data.get_tile_image(position)
         except ValueError:
             return self.default_image
 
+    def get_tile_stack_image(self, position, layers, cache=None):
+        """ Return the composited image of all layers at a x, y position
+        """
+        x, y = position
+        get_gid = self.data.get_tile_gid
+        try:
+            gids = tuple(get_gid((x, y, l)) for l in layers)
+        except ValueError:
+            return self.default_image
+        if self.animation_gids:
+            frames = self.animation_gids
+            gids = tuple(frames.get(gid, gid) for gid in gids)
+        if cache is None:
+            cache = self.tile_cache
+        return cache.get_image(gids)
+
+    def get_overlay_layers(self):
+        """ Return the visible tile layers that are drawn to the overlay
+        """
+        return [l for l in self.data.visible_tile_layers
+                if l > self.overlay_layer]
+
+    def get_queue_layers(self):
+        """ Return the layers to queue for each cell
+
+        When tile stacks are composited, each cell is queued once with a
+        layer of None, meaning all of the visible tile layers.
+        """
+        if self.tile_cache is None:
+            return list(self.data.visible_tile_layers)
+        else:
+            return [None]
+
     def scroll(self, vector):
         """ scroll the background in pixels
         """
         self.center((vector[0] + self.old_x, vector[1] + self.old_y))
 
-    def center(self, coords):
-        """ center the map on a pixel
+    def clamp_center(self, coords):
+        """ round the center to a pixel, and keep it in the map if clamping
         """
         x, y = [round(i, 0) for i in coords]
 
@@ -138,11 +340,31 @@ class BufferedRenderer(object):
             elif y + self.half_height > self.rect.height:
                 y = self.rect.height - self.half_height
 
+        return x, y
+
+    def center(self, coords):
+        """ center the map on a pixel
+        """
+        x, y = self.clamp_center(coords)
+        self.center_parallax(x, y)
+
+        # smoothed movement of the camera, in pixels per call
+        if not self.blank:
+            vx, vy = self.velocity
+            self.velocity = ((vx + x - self.old_x) / 2.0,
+                             (vy + y - self.old_y) / 2.0)
+
         if self.old_x == x and self.old_y == y:
             self.idle = True
             return
 
-        hpad = int(self.padding / 2)
+        self.place_view(x, y)
+
+    def place_view(self, x, y):
+        """ Move the view and scroll the buffer to center the map on a pixel
+        """
+        xpad = self.get_lead(self.velocity[0])
+        ypad = self.get_lead(self.velocity[1])
         tw = self.data.tilewidth
         th = self.data.tileheight
         self.idle = False
@@ -152,72 +374,178 @@ class BufferedRenderer(object):
         top, self.yoffset = divmod(y - self.half_height, th)
 
         # determine if tiles should be redrawn
-        dx = int(left - hpad - self.view.left)
-        dy = int(top - hpad - self.view.top)
+        dx = int(left - xpad - self.view.left)
+        dy = int(top - ypad - self.view.top)
 
         # adjust the offsets of the buffer is placed correctly
-        self.xoffset += hpad * tw
-        self.yoffset += hpad * th
+        self.xoffset += xpad * tw
+        self.yoffset += ypad * th
 
         # adjust the view if the view has changed
         if (abs(dx) >= 1) or (abs(dy) >= 1):
-            self.flush()
-            self.view = self.view.move((dx, dy))
+            # queued tiles are map coordinates, so they can still be drawn
+            # after the scroll.  the lock keeps the tile thread out.
+            with self.lock:
+                self.view = self.view.move((dx, dy))
+
+                # scroll the image (much faster than redrawing the tiles!)
+                self.buffer.scroll(-dx * tw, -dy * th)
+                if self.overlay is not None:
+                    self.overlay.scroll(-dx * tw, -dy * th)
 
-            # scroll the image (much faster than redrawing the tiles!)
-            self.buffer.scroll(-dx * tw, -dy * th)
-            self.update_queue(self.get_edge_tiles((dx, dy)))
+            self.queue_regions(self.get_edge_rects((dx, dy)))
 
         self.old_x, self.old_y = x, y
 
+    def center_parallax(self, x, y):
+        """ Center the parallax groups for a center of the map
+
+        the top left of a group's view is the top left of the map's view,
+        scaled by the parallax factor of the group.
+        """
+        hw = self.half_width
+        hh = self.half_height
+        for (fx, fy), renderer, below in self.parallax_renderers:
+            renderer.center(((x - hw) * fx + hw, (y - hh) * fy + hh))
+
+    def get_lead(self, velocity):
+        """ Return the cells of padding to keep behind the camera on an axis
+
+        velocity is the movement of the camera on the axis.  the padding is
+        split evenly, unless prefetch is enabled and the camera is moving.
+        one cell of the padding is taken by the cell that is partly in view,
+        so then the other padding - 1 cells are put in the direction of travel.
+        """
+        hpad = int(self.padding / 2)
+        if not self.prefetch:
+            return hpad
+        if velocity > self.prefetch_threshold:
+            return 0
+        if velocity < -self.prefetch_threshold:
+            return self.padding - 1
+        return hpad
+
+    def get_visible_rect(self):
+        """ Return the rect, in tiles, of the cells that are in view
+        """
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        left = int(self.xoffset // tw)
+        top = int(self.yoffset // th)
+        right = int(math.ceil((self.xoffset + self.size[0]) / float(tw)))
+        bottom = int(math.ceil((self.yoffset + self.size[1]) / float(th)))
+        return pygame.Rect(self.view.left + left, self.view.top + top,
+                           right - left, bottom - top)
+
     def update_queue(self, iterator):
         """ Add some tiles to the queue
         """
         self.queue = chain(self.queue, iterator)
 
-    def get_edge_tiles(self, offset):
-        """ Get the tile coordinates that need to be redrawn
+    def queue_regions(self, rects):
+        """ Queue rects of cells, in tiles, to be redrawn with their objects
+        """
+        self.update_queue(chain.from_iterable(self.get_region_tiles(rect)
+                                              for rect in rects))
+        self.object_areas.extend(rects)
+
+    def get_edge_rects(self, offset):
+        """ Get rects, in tiles, of the edges of the view that need redrawing
         """
         x, y = map(int, offset)
-        layers = list(self.data.visible_tile_layers)
         view = self.view
-        queue = None
+        rects = list()
 
         # NOTE: i'm not sure why the the -1 in right and bottom are required
         #       for python 3.  it may have some performance implications, but
         #       i'll benchmark it later.
 
+        # bottom
+        if y > 0:
+            rects.append(pygame.Rect(view.left, view.bottom - y - 1,
+                                     view.width, y + 1))
+
+        # top
+        elif y < 0:
+            rects.append(pygame.Rect(view.left, view.top, view.width, -y))
+
         # right
         if x > 0:
-            queue = product(range(view.right - x - 1, view.right),
-                            range(view.top, view.bottom), layers)
+            rects.append(pygame.Rect(view.right - x - 1, view.top,
+                                     x + 1, view.height))
 
         # left
         elif x < 0:
-            queue = product(range(view.left, view.left - x),
-                            range(view.top, view.bottom), layers)
+            rects.append(pygame.Rect(view.left, view.top, -x, view.height))
 
-        # bottom
-        if y > 0:
-            p = product(range(view.left, view.right),
-                        range(view.bottom - y - 1, view.bottom), layers)
-            if queue is None:
-                queue = p
-            else:
-                queue = chain(p, queue)
+        # after a jump, only the part in the buffer needs to be drawn
+        return [r.clip(view) for r in rects]
 
-        # top
-        elif y < 0:
-            p = product(range(view.left, view.right),
-                        range(view.top, view.top - y), layers)
-            if queue is None:
-                queue = p
-            else:
-                queue = chain(p, queue)
+    def get_edge_tiles(self, offset):
+        """ Get the tile coordinates that need to be redrawn
+        """
+        return chain.from_iterable(self.get_region_tiles(rect)
+                                   for rect in self.get_edge_rects(offset))
 
-        return queue
+    def get_region_tiles(self, rect):
+        """ Get the tile coordinates to queue for a rect of cells
 
-    def update(self, dt=None):
+        if the data can tell which cells have tiles, only those are queued.
+        """
+        layers = self.get_queue_layers()
+        get_runs = getattr(self.data, 'get_tile_runs', None)
+        if get_runs is None or None in layers:
+            return product(range(rect.left, rect.right),
+                           range(rect.top, rect.bottom),
+                           layers)
+        return chain.from_iterable(self.get_region_runs(rect, layers))
+
+    def get_region_runs(self, rect, layers):
+        """ Yield iterators of the tiles of a rect of cells, row by row
+
+        cells outside of the map are always queued, to draw the default
+        image.  the first layer of the buffer is always queued if there is a
+        colorkey, and the first layer of the overlay if there is an overlay,
+        because drawing them clears the cell.
+        """
+        full = set()
+        if self.colorkey and layers:
+            full.add(layers[0])
+        if self.overlay is not None:
+            full.update(self.get_overlay_layers()[:1])
+
+        get_runs = self.data.get_tile_runs
+        width = self.data.width
+        left = rect.left
+        right = rect.right
+        inner_left = max(left, 0)
+        inner_right = min(right, width)
+
+        for y in range(rect.top, rect.bottom):
+            if not 0 <= y < self.data.height:
+                yield product(range(left, right), (y,), layers)
+                continue
+
+            if left < inner_left:
+                yield product(range(left, inner_left), (y,), layers)
+
+            for l in layers:
+                if l in full:
+                    yield product(range(inner_left, inner_right), (y,), (l,))
+                    continue
+
+                for start, stop in get_runs(l, y):
+                    if start >= inner_right:
+                        break
+                    start = max(start, inner_left)
+                    stop = min(stop, inner_right)
+                    if start < stop:
+                        yield product(range(start, stop), (y,), (l,))
+
+            if inner_right < right:
+                yield product(range(inner_right, right), (y,), layers)
+
+    def update(self, dt=None, budget=None):
         """ Draw tiles in the background
 
         the drawing operations and management of the buffer is handled here.
@@ -225,8 +553,136 @@ class BufferedRenderer(object):
         off screen tiles.  this will limit expensive tile blits during screen
         draws.  if your draw and update happens every game loop, then you will
         not benefit from updates, but it won't hurt either.
+
+        budget is the time to spend, in microseconds, and defaults to
+        update_budget.  tiles are blitted in batches sized from the measured
+        cost of a tile, until the budget is spent.  if there is no budget,
+        update_rate tiles are blitted.
+        """
+        self.update_parallax(dt)
+        self.update_animations(dt)
+        self.update_tile_changes()
+
+        if budget is None:
+            budget = self.update_budget
+
+        # tiles that were scrolled out of the buffer are dropped
+        collide = self.view.collidepoint
+        queued = (t for t in self.queue if collide(t[0], t[1]))
+
+        if budget is None:
+            tiles = list(islice(queued, self.update_rate))
+            if tiles:
+                self.blit_tiles(tiles)
+                self.buffer_changed = True
+                self.prefetch_hits += len(tiles)
+            return
+
+        start = default_timer()
+        deadline = start + budget / 1000000.0
+        batch = self.update_rate
+        while 1:
+            now = default_timer()
+            if self.tile_cost:
+                batch = int((deadline - now) / self.tile_cost)
+            if batch < 1:
+                break
+
+            tiles = list(islice(queued, batch))
+            if not tiles:
+                break
+
+            self.blit_tiles(tiles)
+            self.buffer_changed = True
+            self.prefetch_hits += len(tiles)
+
+            # moving average of the time to blit one tile
+            cost = (default_timer() - now) / len(tiles)
+            if self.tile_cost is None:
+                self.tile_cost = cost
+            else:
+                self.tile_cost = self.tile_cost * .75 + cost * .25
+
+    def update_animations(self, dt=None):
+        """ Advance the animated tiles by dt milliseconds
+        """
+        if dt and getattr(self.data, 'animations', None):
+            self.animation_time += dt
+            changed = self.set_animation_frames()
+            if changed:
+                self.redraw_animated_tiles(changed)
+
+    def set_animation_frames(self):
+        """ Set the frame of each animated tile for the animation time
+
+        returns a list of the gids whose frame changed.
+        """
+        changed = list()
+        time = self.animation_time
+        for gid, frames in getattr(self.data, 'animations', dict()).items():
+            total = sum(duration for frame, duration in frames)
+            remaining = time % total if total else 0
+            for frame, duration in frames:
+                if remaining < duration:
+                    break
+                remaining -= duration
+
+            if self.animation_gids.get(gid) != frame:
+                self.animation_gids[gid] = frame
+                changed.append(gid)
+
+        return changed
+
+    def redraw_animated_tiles(self, gids):
+        """ Draw the cells of the buffer that have one of the animated gids
+        """
+        locations = self.data.animation_locations
+        self.redraw_cells([i for gid in gids for i in locations.get(gid, ())])
+
+    def update_tile_changes(self):
+        """ Draw the cells of the tiles that were changed in the data
+        """
+        get_changes = getattr(self.data, 'get_tile_changes', None)
+        if get_changes is None:
+            return
+
+        changes = get_changes(self.tile_change_serial)
+        if changes is None or changes:
+            self.tile_change_serial = self.data.tile_change_serial
+            self.redraw_cells(changes)
+
+    def redraw_cells(self, tiles):
+        """ Draw the cells of (x, y, layer) tiles again, if they are in view
+
+        tiles on layers that this renderer does not draw are ignored.  if
+        tiles is None, everything is drawn again.
+        """
+        if tiles is None:
+            self.redraw()
+            return
+
+        layers = set(self.data.visible_tile_layers)
+        collide = self.view.collidepoint
+        cells = set((x, y) for x, y, l in tiles
+                    if l in layers and collide(x, y))
+        if not cells:
+            return
+
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        queue_layers = self.get_queue_layers()
+        with self.lock:
+            self.blit_tiles([(x, y, l) for x, y in cells
+                             for l in queue_layers])
+            for x, y in cells:
+                self.draw_objects(area=pygame.Rect(x * tw, y * th, tw, th))
+            self.buffer_changed = True
+
+    def update_parallax(self, dt=None):
+        """ Draw the queued tiles of the parallax groups in the background
         """
-        self.blit_tiles(islice(self.queue, self.update_rate))
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.update(dt)
 
     def draw(self, surface, rect, surfaces=None):
         """ Draw the map onto a surface
@@ -240,9 +696,18 @@ class BufferedRenderer(object):
         rect in screen coordinates.  surfaces will be drawn in order passed,
         and will be correctly drawn with tiles from a higher layer overlapping
         the surface.
+
+        returns a list of rects of the surface that changed since the last
+        draw.  if the map did not move, that is just the area of the surfaces
+        drawn now and the last time.
         """
+        redrawn = self.blank
         if self.blank:
             self.redraw()
+        else:
+            self.update_tile_changes()
+            for factor, renderer, below in self.parallax_renderers:
+                renderer.update_tile_changes()
 
         surblit = surface.blit
         left, top = self.view.topleft
@@ -251,7 +716,11 @@ class BufferedRenderer(object):
         oy -= rect.top
 
         if self.flush_on_draw:
-            self.flush()
+            self.flush_view()
+
+        # the tile threads may blit more tiles after this; they are pushed
+        # by the next draw
+        redrawn |= self.take_buffer_changed()
 
         # need to set clipping otherwise the map will draw outside its area
         original_clip = None
@@ -259,6 +728,9 @@ class BufferedRenderer(object):
             original_clip = surface.get_clip()
             surface.set_clip(rect)
 
+        if self.parallax_renderers:
+            redrawn |= self.draw_parallax(surface, rect, True)
+
         # draw the entire map to the surface,
         # taking in account the scrolling offset
         surblit(self.buffer, (-ox, -oy))
@@ -266,45 +738,297 @@ class BufferedRenderer(object):
         if surfaces is None:
             dirty = list()
 
-        else:
-            def above(x, y):
-                return x > y
-
-            hit = self.layer_quadtree.hit
-            get_tile = self.get_tile_image
-            tile_layers = tuple(self.data.visible_tile_layers)
+        elif self.overlay is not None:
             dirty = [(surblit(i[0], i[1]), i[2]) for i in surfaces]
+            self.draw_overlay(surface, rect, (-ox, -oy),
+                              [i[0] for i in dirty])
 
-            for dirty_rect, layer in dirty:
-                for r in hit(dirty_rect.move(ox, oy)):
-                    x, y, tw, th = r
-                    for l in [i for i in tile_layers if above(i, layer)]:
-                        tile = get_tile((int(x / tw + left),
-                                         int(y / th + top), int(l)))
-                        if tile:
-                            surblit(tile, (x - ox, y - oy))
+        else:
+            offset = (-left * self.data.tilewidth - ox,
+                      -top * self.data.tileheight - oy)
+            dirty = self.draw_surfaces(surface, surfaces, offset)
+
+        if self.parallax_renderers:
+            redrawn |= self.draw_parallax(surface, rect, False)
 
         if self.clipping:
             surface.set_clip(original_clip)
 
-        if self.idle:
-            return [i[0] for i in dirty]
+        return self.get_dirty_rects(rect, [i[0] for i in dirty], redrawn)
+
+    def draw_parallax(self, surface, rect, below):
+        """ Draw the parallax groups that are below or above the map
+
+        returns True if any of the groups changed since the last draw
+        """
+        changed = False
+        for factor, renderer, group_below in self.parallax_renderers:
+            if group_below == below and renderer.draw(surface, rect):
+                changed = True
+        return changed
+
+    def draw_overlay(self, surface, rect, position, rects):
+        """ Blit the overlay over the areas covered by rects
+
+        position is where the overlay is blitted on the surface.  if the rects
+        cover more than half of the rect, the whole overlay is blitted once.
+        """
+        surblit = surface.blit
+        overlay = self.overlay
+        x, y = position
+
+        area = sum(r.width * r.height for r in rects)
+        if area * 2 > rect.width * rect.height:
+            surblit(overlay, position)
         else:
-            return [rect]
+            for r in rects:
+                if r:
+                    surblit(overlay, r, r.move(-x, -y))
+
+    def draw_surfaces(self, surface, surfaces, offset):
+        """ Blit surfaces, and the tiles that should cover them
+
+        surfaces is a list of (image, rect, layer) tuples, like for draw().
+        offset is the position of the map origin on the surface.  the cells
+        covered by each surface are found by dividing its rect by the tile
+        size, then the tiles of layers above the surface are blitted again.
+
+        returns a list of (rect, layer) tuples for each surface blitted
+        """
+        surblit = surface.blit
+        get_tile = self.get_tile_image
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        ox, oy = offset
+        tile_layers = tuple(self.data.visible_tile_layers)
+        dirty = [(surblit(i[0], i[1]), i[2]) for i in surfaces]
+
+        for dirty_rect, layer in dirty:
+            above = [l for l in tile_layers if l > layer]
+            if not above or not dirty_rect:
+                continue
+
+            # the range of cells covered by the rect
+            left = int((dirty_rect.left - ox) // tw)
+            top = int((dirty_rect.top - oy) // th)
+            right = int((dirty_rect.right - 1 - ox) // tw) + 1
+            bottom = int((dirty_rect.bottom - 1 - oy) // th) + 1
+
+            for y, x in product(range(top, bottom), range(left, right)):
+                for l in above:
+                    tile = get_tile((x, y, l))
+                    if tile:
+                        surblit(tile, (x * tw + ox, y * th + oy))
+
+        return dirty
+
+    def get_dirty_rects(self, rect, surface_rects, redrawn=False):
+        """ Return the rects that changed since the last draw
+
+        the whole rect is dirty if the map was redrawn or moved, or if it is
+        drawn to a different rect.  redrawn should be set if tiles were drawn
+        to the buffer; see take_buffer_changed.  otherwise
+        only the areas covered by surfaces this draw and the last are dirty.
+        """
+        center = self.old_x, self.old_y
+        if (redrawn or center != self._drawn_center or
+                rect != self._drawn_rect):
+            dirty = [pygame.Rect(rect)]
+        else:
+            dirty = [r for r in surface_rects + self._drawn_surfaces if r]
+
+        self._drawn_center = center
+        self._drawn_rect = pygame.Rect(rect)
+        self._drawn_surfaces = surface_rects
+        return dirty
+
+    def take_buffer_changed(self):
+        """ Return True if tiles were drawn to the buffer since the last call
+
+        The flag is read and cleared under the lock, so a change made by a
+        tile thread at the same time is not lost.
+        """
+        with self.lock:
+            changed = self.buffer_changed
+            self.buffer_changed = False
+        return changed
 
     def flush(self):
         """ Blit the tiles and block until the tile queue is empty
         """
-        self.blit_tiles(self.queue)
-        self.draw_objects()
+        tiles = list(self.queue)
+        if tiles:
+            self.blit_tiles(tiles)
+            self.buffer_changed = True
+
+        self.draw_object_areas()
+        self.blank = False
+
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.flush()
+
+    def flush_view(self):
+        """ Blit the queued tiles that are in view
+
+        Queued tiles outside of the view are left for update() to draw.
+        Objects are drawn over the areas that are finished, or, while tiles
+        are still queued, over the part of the areas that is in view.
+        """
+        visible = self.get_visible_rect()
+        collide = visible.collidepoint
+        in_buffer = self.view.collidepoint
+        now = list()
+        later = list()
+        for tile in self.queue:
+            if collide(tile[0], tile[1]):
+                now.append(tile)
+            elif in_buffer(tile[0], tile[1]):
+                later.append(tile)
+
+        self.queue = iter(later)
+        if now:
+            self.blit_tiles(now)
+            self.buffer_changed = True
+            self.prefetch_misses += len(now)
+
+        if later:
+            tw = self.data.tilewidth
+            th = self.data.tileheight
+            view = self.view
+            self.object_areas = [r for r in self.object_areas
+                                 if r.colliderect(view)]
+            for rect in self.object_areas:
+                rect = rect.clip(visible)
+                if rect:
+                    area = pygame.Rect(rect.left * tw, rect.top * th,
+                                       rect.width * tw, rect.height * th)
+                    self.draw_objects(area=area)
+        else:
+            self.draw_object_areas()
+
         self.blank = False
 
-    def draw_objects(self):
-        """ Totally unoptimized drawing of objects to the map
+    def draw_object_areas(self):
+        """ Draw objects over the areas of the buffer that were redrawn
+        """
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        for rect in self.object_areas:
+            area = pygame.Rect(rect.left * tw, rect.top * th,
+                               rect.width * tw, rect.height * th)
+            self.draw_objects(area=area)
+        self.object_areas = list()
+
+    def reset_objects(self):
+        """ Forget the rasterized objects
+
+        Call this if objects or object layers are changed.
+        """
+        self.object_index = None
+        self.object_cache.clear()
+
+    def index_objects(self):
+        """ Sort the visible objects into the chunks that they overlap
+        """
+        cw = self.object_chunk_size[0] * self.data.tilewidth
+        ch = self.object_chunk_size[1] * self.data.tileheight
+        scale = getattr(self.data, 'scale', 1)
+        get_image_by_gid = self.data.get_tile_image_by_gid
+        index = dict()
+
+        for layer in self.data.visible_object_layers:
+            for o in (o for o in layer if o.visible):
+                if hasattr(o, 'points'):
+                    xs = [i[0] * scale for i in o.points]
+                    ys = [i[1] * scale for i in o.points]
+                    rect = pygame.Rect(min(xs), min(ys),
+                                       max(xs) - min(xs), max(ys) - min(ys))
+
+                elif o.gid:
+                    tile = get_image_by_gid(o.gid)
+                    if not tile:
+                        continue
+                    rect = tile.get_rect(topleft=(o.x * scale, o.y * scale))
+
+                else:
+                    rect = pygame.Rect(o.x * scale, o.y * scale,
+                                       o.width * scale, o.height * scale)
+
+                # leave room for line widths and rounding
+                rect.inflate_ip(4 * scale, 4 * scale)
+                for cy in range(rect.top // ch, (rect.bottom - 1) // ch + 1):
+                    for cx in range(rect.left // cw,
+                                    (rect.right - 1) // cw + 1):
+                        key = cx * cw, cy * ch, cw, ch
+                        index.setdefault(key, list()).append(o)
+
+        self.object_index = index
+
+    def get_object_chunk(self, key):
+        """ Return the rasterized objects of a chunk, rendering it if needed
+        """
+        chunk = self.object_cache.get(key)
+        if chunk is None:
+            x, y, w, h = key
+            chunk = pygame.Surface((w, h))
+            chunk.fill(self.transparent_colorkey)
+            chunk.set_colorkey(self.transparent_colorkey)
+            self.rasterize_objects(chunk, (x, y), self.object_index[key])
+            self.object_cache.put(key, chunk)
+        return chunk
+
+    def draw_objects(self, surface=None, offset=None, area=None):
+        """ Draw the visible objects of the map
+
+        Objects are drawn onto the buffer, unless another surface is passed.
+        offset is the position of the surface in map pixels, and defaults to
+        the position of the buffer.
+
+        Objects are rasterized once into cached, tile aligned chunks.  Only
+        the parts of chunks that overlap area, a rect in map pixels, are
+        blitted.  By default, area is the whole surface.
+        """
+        if self.object_index is None:
+            self.index_objects()
+
+        if not self.object_index:
+            return
+
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        cw = self.object_chunk_size[0] * tw
+        ch = self.object_chunk_size[1] * th
+        buff = self.buffer if surface is None else surface
+        blit = buff.blit
+        index = self.object_index
+
+        if offset is None:
+            ox = self.view.left * tw
+            oy = self.view.top * th
+        else:
+            ox, oy = offset
+
+        if area is None:
+            area = pygame.Rect((ox, oy), buff.get_size())
+
+        for cy in range(area.top // ch, (area.bottom - 1) // ch + 1):
+            for cx in range(area.left // cw, (area.right - 1) // cw + 1):
+                key = cx * cw, cy * ch, cw, ch
+                if key in index:
+                    clip = area.clip(key)
+                    blit(self.get_object_chunk(key),
+                         (clip.left - ox, clip.top - oy),
+                         clip.move(-key[0], -key[1]))
+
+    def rasterize_objects(self, surface, offset, objects):
+        """ Draw objects onto a surface
+
+        offset is the position of the surface in map pixels, after scaling.
         """
         tw = self.data.tilewidth
         th = self.data.tileheight
-        buff = self.buffer
+        scale = getattr(self.data, 'scale', 1)
+        buff = surface
         blit = buff.blit
         map_gid = self.data.tmx.map_gid
         default_color = self.default_shape_color
@@ -312,9 +1036,7 @@ class BufferedRenderer(object):
         _draw_textured_poly = pygame.gfxdraw.textured_polygon
         _draw_poly = pygame.draw.polygon
         _draw_lines = pygame.draw.lines
-
-        ox = self.view.left * tw
-        oy = self.view.top * th
+        ox, oy = offset
 
         def draw_textured_poly(texture, points):
             try:
@@ -325,119 +1047,277 @@ class BufferedRenderer(object):
         def draw_poly(color, points, width=0):
             _draw_poly(buff, color, points, width)
 
-        def draw_lines(color, points, width=2):
+        def draw_lines(color, points, width=2 * scale):
             _draw_lines(buff, color, False, points, width)
 
         def to_buffer(pt):
-            return pt[0] - ox, pt[1] - oy
+            return pt[0] * scale - ox, pt[1] * scale - oy
 
-        for layer in self.data.visible_object_layers:
-            for o in (o for o in layer if o.visible):
-                texture_gid = getattr(o, "texture", None)
-                color = getattr(o, "color", default_color)
-
-                if texture_gid:
-                    texture_gid = int(texture_gid) + 1
+        for o in objects:
+            texture_gid = getattr(o, "texture", None)
+            color = getattr(o, "color", default_color)
 
-                # BUG: this is not going to be completely accurate, because it
-                # does not take into account times where texture is flipped.
-                if texture_gid:
-                    texture_gid = map_gid(texture_gid)[0][0]
-                    texture = get_image_by_gid(int(texture_gid))
-
-                if hasattr(o, 'points'):
-                    points = [to_buffer(i) for i in o.points]
-                    if o.closed:
-                        if texture_gid:
-                            draw_textured_poly(texture, points)
-                        else:
-                            draw_poly(color, points)
-                    else:
-                        draw_lines(color, points)
+            if texture_gid:
+                texture_gid = int(texture_gid) + 1
 
-                elif o.gid:
-                    tile = get_image_by_gid(o.gid)
-                    if tile:
-                        pt = to_buffer((o.x, o.y))
-                        blit(tile, pt)
+            # BUG: this is not going to be completely accurate, because it
+            # does not take into account times where texture is flipped.
+            if texture_gid:
+                texture_gid = map_gid(texture_gid)[0][0]
+                texture = get_image_by_gid(int(texture_gid))
 
-                else:
-                    x, y = to_buffer((o.x, o.y))
-                    points = ((x, y), (x + o.width, y),
-                              (x + o.width, y + o.height), (x, y + o.height))
+            if hasattr(o, 'points'):
+                points = [to_buffer(i) for i in o.points]
+                if o.closed:
                     if texture_gid:
                         draw_textured_poly(texture, points)
                     else:
                         draw_poly(color, points)
+                else:
+                    draw_lines(color, points)
+
+            elif o.gid:
+                tile = get_image_by_gid(o.gid)
+                if tile:
+                    pt = to_buffer((o.x, o.y))
+                    blit(tile, pt)
+
+            else:
+                x, y = to_buffer((o.x, o.y))
+                w = o.width * scale
+                h = o.height * scale
+                points = ((x, y), (x + w, y), (x + w, y + h), (x, y + h))
+                if texture_gid:
+                    draw_textured_poly(texture, points)
+                else:
+                    draw_poly(color, points)
 
-    def blit_tiles(self, iterator):
+    def blit_tiles(self, iterator, origin=None, buffer=None, overlay=None):
         """ Bilts (x, y, layer) tuples to buffer from iterator
+
+        by default the tiles are blitted to the buffer and overlay of the
+        renderer.  origin is the cell, in tiles, at the top left of buffer,
+        and defaults to the top left of the view.
         """
+        if buffer is None:
+            buffer = self.buffer
+            overlay = self.overlay
+        if origin is None:
+            origin = self.view.topleft
+
+        if self.tile_cache is not None:
+            return self.blit_tile_stacks(iterator, origin, buffer, overlay)
+
         tw = self.data.tilewidth
         th = self.data.tileheight
-        blit = self.buffer.blit
-        ltw = self.view.left * tw
-        tth = self.view.top * th
+        blit = buffer.blit
+        ltw = origin[0] * tw
+        tth = origin[1] * th
         get_tile = self.get_tile_image
-        fill = self.buffer.fill
+        fill = buffer.fill
+
+        if overlay is not None:
+            iterator = list(iterator)
+            self.blit_overlay_tiles(iterator, origin, overlay)
 
         if self.colorkey:
-            old_tiles = set()
+            # clear the cell when the first layer is drawn
+            first = next(self.data.visible_tile_layers, None)
             for x, y, l in iterator:
+                if l == first:
+                    fill(self.colorkey,
+                         (x * tw - ltw, y * th - tth, tw, th))
                 tile = get_tile((x, y, l))
                 if tile:
-                    if l == 0:
-                        fill(self.colorkey,
-                             (x * tw - ltw, y * th - tth, tw, th))
-                    old_tiles.add((x, y))
                     blit(tile, (x * tw - ltw, y * th - tth))
-                else:
-                    if l > 0:
-                        if (x, y) not in old_tiles:
-                            fill(self.colorkey,
-                                 (x * tw - ltw, y * th - tth, tw, th))
         else:
             for x, y, l in iterator:
                 tile = get_tile((x, y, l))
                 if tile:
                     blit(tile, (x * tw - ltw, y * th - tth))
 
+    def blit_overlay_tiles(self, tiles, origin, overlay):
+        """ Bilts (x, y, layer) tuples above overlay_layer to the overlay
+        """
+        layers = self.get_overlay_layers()
+        if not layers:
+            return
+
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        blit = overlay.blit
+        fill = overlay.fill
+        colorkey = self.transparent_colorkey
+        ltw = origin[0] * tw
+        tth = origin[1] * th
+        get_tile = self.get_tile_image
+        first = layers[0]
+
+        for x, y, l in tiles:
+            if l < first:
+                continue
+            if l == first:
+                fill(colorkey, (x * tw - ltw, y * th - tth, tw, th))
+            tile = get_tile((x, y, l))
+            if tile:
+                blit(tile, (x * tw - ltw, y * th - tth))
+
+    def blit_tile_stacks(self, iterator, origin, buffer, overlay):
+        """ Bilts (x, y, None) tuples to buffer as composited tile stacks
+        """
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        blit = buffer.blit
+        ltw = origin[0] * tw
+        tth = origin[1] * th
+        get_stack = self.get_tile_stack_image
+        layers = tuple(self.data.visible_tile_layers)
+
+        if overlay is None:
+            for x, y, l in iterator:
+                blit(get_stack((x, y), layers), (x * tw - ltw, y * th - tth))
+
+        else:
+            overlay_blit = overlay.blit
+            overlay_cache = self.overlay_cache
+            upper = tuple(self.get_overlay_layers())
+            for x, y, l in iterator:
+                position = x * tw - ltw, y * th - tth
+                blit(get_stack((x, y), layers), position)
+                overlay_blit(get_stack((x, y), upper, overlay_cache), position)
+
     def redraw(self):
         """ redraw the visible portion of the buffer -- it is slow.
         """
-        queue = product(range(self.view.left, self.view.right),
-                        range(self.view.top, self.view.bottom),
-                        self.data.visible_tile_layers)
-
-        self.update_queue(queue)
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.redraw()
+        self.queue_regions([self.view.copy()])
         self.flush()
+        self.blank = False
 
 
 class ThreadedRenderer(BufferedRenderer):
     """ Off-screen tiling is handled in a thread
+
+    Each rect of cells that needs to be redrawn, like an edge strip, is one
+    item in the queue.  The thread renders the tiles and objects of a strip
+    into a back buffer without holding any lock, then takes the lock once to
+    blit the back buffer onto the renderer's buffer.
+
+    Pass workers to start more than one thread.  pygame releases the GIL
+    while blitting, so large redraws, like the whole view after a resize or
+    a jump of the camera, are split into horizontal bands that are rendered
+    in parallel.  Only rects with at least band_min_cells cells are split.
+
+    latency is a moving average of the seconds between queueing a strip and
+    blitting it to the buffer, and max_latency is the longest time seen.
+    get_queue_depth() returns the number of strips waiting to be rendered.
     """
 
     def __init__(self, *args, **kwargs):
+        workers = kwargs.pop('workers', 1)
         BufferedRenderer.__init__(self, *args, **kwargs)
         self.flush_on_draw = False
+        self.band_min_cells = 128
         self.queue = queue.Queue()
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.latency_lock = threading.Lock()
 
-        self.thread = TileThread(renderer=self)
-        self.thread.start()
+        self.threads = [TileThread(renderer=self) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+        self.thread = self.threads[0]
 
-    def update(self, dt=None):
-        pass
+    def update(self, dt=None, budget=None):
+        self.update_parallax(dt)
+        self.update_animations(dt)
+        self.update_tile_changes()
 
     def flush(self):
         self.queue.join()
+        for factor, renderer, below in self.parallax_renderers:
+            renderer.flush()
+
+    def flush_view(self):
+        self.flush()
+
+    def get_queue_depth(self):
+        """ Return the number of items waiting in the queue
+        """
+        return self.queue.qsize()
 
     def update_queue(self, iterator):
-        for i in iterator:
-            self.queue.put(i)
+        """ Add some tiles to the queue, as one item
+        """
+        self.queue.put((list(iterator), default_timer()))
+
+    def queue_regions(self, rects):
+        """ Queue rects of cells, in tiles, to be redrawn with their objects
+        """
+        for rect in rects:
+            for band in self.split_region(rect):
+                self.queue.put((band, default_timer()))
+
+    def split_region(self, rect):
+        """ Split a rect of cells into horizontal bands, one for each thread
+        """
+        if not rect:
+            return []
+
+        count = min(len(self.threads), rect.height)
+        if count < 2 or rect.width * rect.height < self.band_min_cells:
+            return [rect]
+
+        bands = list()
+        top = rect.top
+        for i in range(1, count + 1):
+            bottom = rect.top + rect.height * i // count
+            bands.append(pygame.Rect(rect.left, top, rect.width, bottom - top))
+            top = bottom
+        return bands
+
+    def blit_region(self, rect):
+        """ Render a rect of cells to a back buffer, then blit it to the buffer
+        """
+        tw = self.data.tilewidth
+        th = self.data.tileheight
+        size = rect.width * tw, rect.height * th
+
+        back = pygame.Surface(size, 0, self.buffer)
+        if self.colorkey:
+            back.fill(self.colorkey)
+
+        overlay = None
+        if self.overlay is not None:
+            overlay = pygame.Surface(size, 0, self.overlay)
+            overlay.fill(self.transparent_colorkey)
+
+        self.blit_tiles(self.get_region_tiles(rect), rect.topleft,
+                        back, overlay)
+        self.draw_objects(back, (rect.left * tw, rect.top * th))
+
+        # the view may have moved while the strip was rendered
+        with self.lock:
+            position = ((rect.left - self.view.left) * tw,
+                        (rect.top - self.view.top) * th)
+            self.buffer.blit(back, position)
+            if overlay is not None:
+                self.overlay.blit(overlay, position)
+            self.buffer_changed = True
+
+    def measure_latency(self, queued):
+        """ Record the time since an item was queued
+        """
+        latency = default_timer() - queued
+        with self.latency_lock:
+            self.latency = self.latency * .9 + latency * .1
+            if latency > self.max_latency:
+                self.max_latency = latency
 
 
 class TileThread(threading.Thread):
-    """ poll the tile queue for new tiles and draw them to the buffer
+    """ poll the tile queue for strips and draw them to the buffer
     """
 
     def __init__(self, *args, **kwargs):
@@ -447,47 +1327,20 @@ class TileThread(threading.Thread):
 
     def run(self):
         r = self.renderer
-
-        tw = r.data.tilewidth
-        th = r.data.tileheight
-        get_tile = r.get_tile_image
-        colorkey = r.colorkey
         tile_queue = r.queue
         lock = r.lock
-        old_tiles = set()
-        old_view = None
 
         running = 1
 
         while running:
-            x, y, l = tile_queue.get()
-
-            # pyscroll may change these references to another object
-            # so, while we are defrencing them, we need to create new
-            # references if they change.
-            if old_view is not r.view:
-                fill = r.buffer.fill
-                blit = r.buffer.blit
-                ltw = r.view.left * tw
-                tth = r.view.top * th
-                old_tiles = set()
-
-            if colorkey:
-                tile = get_tile((x, y, l))
-                if tile:
-                    with lock:
-                        if l == 0:
-                            fill(colorkey, (x * tw - ltw, y * th - tth, tw, th))
-                        old_tiles.add((x, y, l))
-                        blit(tile, (x * tw - ltw, y * th - tth))
-                else:
-                    if (x, y, l - 1) not in old_tiles:
-                        with lock:
-                            fill(colorkey, (x * tw - ltw, y * th - tth, tw, th))
+            item, queued = tile_queue.get()
+            if isinstance(item, pygame.Rect):
+                # skip strips that were scrolled out of the buffer
+                if r.view.colliderect(item):
+                    r.blit_region(item)
             else:
-                tile = get_tile((x, y, l))
-                if tile:
-                    with lock:
-                        blit(tile, (x * tw - ltw, y * th - tth))
-
+                with lock:
+                    r.blit_tiles(item)
+                    r.buffer_changed = True
+            r.measure_latency(queued)
             tile_queue.task_done()
@@ -0,0 +1,284 @@
+"""
+Compiled map cache for pytmx
+
+Parsing a map with ElementTree, decoding every layer and registering every
+gid takes time for large maps.  load_tmx stores the parsed TiledMap in a
+cache file, and loads it from there until the map or one of its external
+tilesets changes.
+
+The cache files are kept in a directory of the user, see cache_dir, and not
+next to the maps.  The map is pickled, and unpickling can run code, so a
+cache must only be read from a place other users cannot write to.
+
+The cache file is:
+
+    magic          8 bytes, MAGIC
+    header length  32 bit unsigned, little endian
+    header         JSON object, encoded as utf-8, with:
+                   sources, the {path: sha1} of the map and its tilesets
+                   platform, the byte order and array sizes of the platform
+                   digest, the sha1 of the rest of the file
+    map length     32 bit unsigned, little endian
+    map            pickle of the TiledMap, without images
+    buffers        the raw arrays of the layers, each aligned to 8 bytes
+
+The header is checked before anything is unpickled.  The arrays of the tile
+layers are not pickled; they are stored after the map, and read back from a
+memory map of the file.
+"""
+import array
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+import six
+
+from .pytmx import TiledMap, TiledTileLayer
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['load_tmx', 'read_cache', 'write_cache', 'cache_filename',
+           'cache_dir']
+
+# change the version when the layout of the map classes change
+MAGIC = b'PYTMXC02'
+ALIGN = 8
+
+
+def cache_dir():
+    """Return the directory of the cache files of the current user
+
+    $XDG_CACHE_HOME/pytmx if it is set, or %LOCALAPPDATA%/pytmx on windows,
+    otherwise ~/.cache/pytmx.
+
+    :rtype: str
+    """
+    base = os.environ.get('XDG_CACHE_HOME')
+    if not base and sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pytmx')
+
+
+def cache_filename(filename):
+    """Return the name of the cache file for a TMX file
+
+    The name has the sha1 of the absolute path of the map, so maps with the
+    same name in different directories have their own caches.
+
+    :param filename: filename of the TMX file
+    :rtype: str
+    """
+    path = os.path.abspath(filename)
+    if not isinstance(path, bytes):
+        path = path.encode('utf-8')
+    name = '{0}-{1}.cache'.format(os.path.basename(filename),
+                                  hashlib.sha1(path).hexdigest()[:16])
+    return os.path.join(cache_dir(), name)
+
+
+def file_hash(path):
+    """Return the sha1 of the contents of a file, as a hex string
+    """
+    with open(path, 'rb') as fh:
+        return hashlib.sha1(fh.read()).hexdigest()
+
+
+def platform_key():
+    """Return what the layout of the arrays depends on, for this platform
+    """
+    sizes = [str(array.array(typecode).itemsize) for typecode in 'BHIL']
+    return ' '.join([sys.byteorder] + sizes)
+
+
+def map_sources(tmxdata):
+    """Return the paths of the files a map was parsed from
+
+    The paths are relative to the directory of the map.
+
+    :param tmxdata: TiledMap, loaded from a file
+    :rtype: list of paths; the map first, then its external tilesets
+    """
+    dirname = os.path.dirname(os.path.abspath(tmxdata.filename))
+    paths = [os.path.abspath(tmxdata.filename)]
+    paths.extend(ts.filename for ts in tmxdata.tilesets if ts.filename)
+    return [os.path.relpath(path, dirname) for path in paths]
+
+
+def load_tmx(filename, index_gids=False, lazy=False):
+    """Return a TiledMap for a TMX file, from its cache if it is current
+
+    If the cache is missing or stale, the map is parsed and the cache is
+    written again.  Images are not cached; the map is returned without
+    them, as TiledMap(filename) would be.
+
+    :param filename: filename of the TMX file
+    :param index_gids: if true, tile layers index where each GID is used
+    :param lazy: if true, the tile layers of a parsed map are decoded when
+    first used.  lazy layers are cached compressed.
+    :rtype: TiledMap
+    """
+    tmxdata = read_cache(filename)
+    if tmxdata is None:
+        tmxdata = TiledMap(filename, index_gids, lazy)
+        try:
+            write_cache(tmxdata)
+        except (IOError, OSError, pickle.PicklingError) as e:
+            logger.warning('Cannot write map cache for %s: %s', filename, e)
+        return tmxdata
+
+    tmxdata.index_gids = index_gids
+    for layer in tmxdata.layers:
+        if isinstance(layer, TiledTileLayer):
+            if not index_gids:
+                layer.gid_index = None
+            elif layer.gid_index is None and layer.payload is None:
+                # lazy layers build the index when they are decoded
+                layer.build_gid_index()
+    return tmxdata
+
+
+def write_cache(tmxdata):
+    """Write the cache file of a map
+
+    The map must be one loaded from a file, before its images are loaded
+    or its tiles are changed.
+
+    :param tmxdata: TiledMap
+    """
+    dirname = os.path.dirname(os.path.abspath(tmxdata.filename))
+    sources = dict((path, file_hash(os.path.join(dirname, path)))
+                   for path in map_sources(tmxdata))
+
+    buffers = list()
+    offsets = [0]
+
+    def persistent_id(obj):
+        if type(obj) is array.array:
+            buffers.append(obj)
+            offset = offsets[0]
+            size = len(obj) * obj.itemsize
+            offsets[0] += size + -size % ALIGN
+            return obj.typecode, offset, len(obj)
+        return None
+
+    fh = six.BytesIO()
+    pickler = pickle.Pickler(fh, 2)
+    pickler.persistent_id = persistent_id
+    pickler.dump(tmxdata)
+    map_pickle = fh.getvalue()
+
+    # the header has the digest of everything after it
+    body = [struct.pack('<I', len(map_pickle)), map_pickle,
+            b'\0' * (-(4 + len(map_pickle)) % ALIGN)]
+    for buf in buffers:
+        data = buf.tobytes() if hasattr(buf, 'tobytes') else buf.tostring()
+        body.append(data)
+        body.append(b'\0' * (-len(data) % ALIGN))
+
+    digest = hashlib.sha1()
+    for data in body:
+        digest.update(data)
+    header = json.dumps({'sources': sources,
+                         'platform': platform_key(),
+                         'digest': digest.hexdigest()}).encode('utf-8')
+
+    # spaces after the JSON keep the arrays aligned in the file
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % ALIGN)
+
+    path = cache_filename(tmxdata.filename)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path), 0o700)
+
+    # write to another file first, so a cache is never half written
+    temp = path + '.tmp'
+    with open(temp, 'wb') as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack('<I', len(header)))
+        fh.write(header)
+        for data in body:
+            fh.write(data)
+    getattr(os, 'replace', os.rename)(temp, path)
+
+
+def read_cache(filename):
+    """Return the map stored in the cache of a TMX file
+
+    :param filename: filename of the TMX file
+    :rtype: TiledMap, or None if there is no cache or it is not current
+    """
+    path = cache_filename(filename)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return read_cache_map(filename, mm)
+        finally:
+            mm.close()
+    except Exception as e:
+        logger.info('Cannot read map cache %s: %s', path, e)
+        return None
+
+
+def read_cache_map(filename, mm):
+    """Return the map in a memory map of a cache file, if it is current
+
+    The header is checked before the map is unpickled.
+    """
+    if mm[:len(MAGIC)] != MAGIC:
+        return None
+
+    offset = len(MAGIC)
+    size, = struct.unpack_from('<I', mm, offset)
+    header = json.loads(mm[offset + 4:offset + 4 + size].decode('utf-8'))
+    if header.get('platform') != platform_key():
+        return None
+    dirname = os.path.dirname(os.path.abspath(filename))
+    for source, digest in header['sources'].items():
+        source = os.path.join(dirname, source)
+        if not os.path.exists(source) or file_hash(source) != digest:
+            return None
+
+    offset += 4 + size
+    if hashlib.sha1(mm[offset:]).hexdigest() != header['digest']:
+        return None
+
+    size, = struct.unpack_from('<I', mm, offset)
+    start = offset + 4
+    base = start + size + -(4 + size) % ALIGN
+
+    try:
+        view = memoryview(mm)
+    except TypeError:
+        # python 2 cannot make a memoryview of a memory map
+        view = None
+
+    def persistent_load(pid):
+        typecode, offset, length = pid
+        buf = array.array(typecode)
+        stop = base + offset + length * buf.itemsize
+        if view is not None:
+            buf.frombytes(view[base + offset:stop])
+        else:
+            buf.fromstring(mm[base + offset:stop])
+        return buf
+
+    try:
+        unpickler = pickle.Unpickler(six.BytesIO(mm[start:start + size]))
+        unpickler.persistent_load = persistent_load
+        tmxdata = unpickler.load()
+    finally:
+        if view is not None:
+            # the memory map cannot be closed while a view is exported
+            view.release()
+
+    tmxdata.filename = filename
+    return tmxdata
@@ -1,11 +1,21 @@
+import sys
+import array
 import logging
+import threading
 import six
+from bisect import bisect_left
 from itertools import chain, product, islice
-from collections import defaultdict
+from collections import defaultdict, namedtuple, OrderedDict
 from xml.etree import ElementTree
 from six.moves import zip, map
 from .constants import *
 
+# numpy is optional, and makes loading large layers faster
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 logger = logging.getLogger(__name__)
 ch = logging.StreamHandler()
 ch.setLevel(logging.INFO)
@@ -13,7 +23,10 @@ logger.addHandler(ch)
 logger.setLevel(logging.INFO)
 
 __all__ = ['TiledMap', 'TiledTileset', 'TiledTileLayer', 'TiledObject',
-           'TiledObjectGroup', 'TiledImageLayer']
+           'TiledObjectGroup', 'TiledImageLayer', 'AnimationFrame']
+
+# one frame of an animated tile.  duration is in milliseconds
+AnimationFrame = namedtuple('AnimationFrame', ['gid', 'duration'])
 
 
 def decode_gid(raw_gid):
@@ -30,6 +43,76 @@ def decode_gid(raw_gid):
     return gid, flags
 
 
+def read_gids(data):
+    """Return an array of the 32 bit, little endian gids in a bytes object
+    """
+    if numpy is not None:
+        return numpy.frombuffer(data, dtype='<u4')
+
+    typecode = 'I' if array.array('I').itemsize == 4 else 'L'
+    gids = array.array(typecode)
+    if hasattr(gids, 'frombytes'):
+        gids.frombytes(data)
+    else:
+        gids.fromstring(data)
+    if sys.byteorder == 'big':
+        gids.byteswap()
+    return gids
+
+
+def register_gids(register, raw_gids, register_only=False):
+    """Register each unique gid found in TMX data, and return the pytmx gids
+
+    The gids are registered in the order they are first found, so they are
+    the same as if each was registered in turn, but only once for each value.
+
+    :param register: TiledMap.register_gid
+    :param raw_gids: sequence of gids, with flags, from the TMX data
+    :param register_only: if true, the pytmx gids are not returned
+    :rtype: array of pytmx gids, or None if register_only is true
+    """
+    if numpy is not None:
+        raw_gids = numpy.asarray(raw_gids, dtype=numpy.uint32)
+        if register_only:
+            values, first = numpy.unique(raw_gids, return_index=True)
+        else:
+            values, first, inverse = numpy.unique(
+                raw_gids, return_index=True, return_inverse=True)
+
+        # flags, from the high bits, for every unique gid at once
+        flags = (((values & GID_TRANS_FLIPX) != 0) * TRANS_FLIPX +
+                 ((values & GID_TRANS_FLIPY) != 0) * TRANS_FLIPY +
+                 ((values & GID_TRANS_ROT) != 0) * TRANS_ROT)
+        gids = values & ~numpy.uint32(GID_TRANS_FLIPX | GID_TRANS_FLIPY |
+                                      GID_TRANS_ROT)
+
+        table = numpy.zeros(len(values), dtype=numpy.uint32)
+        for i in numpy.argsort(first, kind='mergesort'):
+            table[i] = register(int(gids[i]), int(flags[i]))
+        if register_only:
+            return None
+        return table[inverse.reshape(-1)]
+
+    table = OrderedDict.fromkeys(raw_gids)
+    for raw_gid in table:
+        table[raw_gid] = register(*decode_gid(raw_gid))
+    if register_only:
+        return None
+    return array.array('L', map(table.__getitem__, raw_gids))
+
+
+def gid_typecode(maxgid):
+    """Return the smallest array typecode that can hold gids below maxgid
+
+    :param maxgid: TiledMap.maxgid, one more than the largest pytmx gid
+    :rtype: 'B', 'H' or 'I' ('L' if 'I' is less than 32 bits)
+    """
+    for typecode in 'BHIL':
+        if maxgid <= 1 << (8 * array.array(typecode).itemsize):
+            return typecode
+    raise OverflowError
+
+
 def handle_bool(text):
     # properly convert strings to a bool
     try:
@@ -75,6 +158,8 @@ types.update({
     "y": float,
     "value": str,
     "rotation": float,
+    "parallaxx": float,
+    "parallaxy": float,
 })
 
 
@@ -140,8 +225,10 @@ class TiledElement(object):
         self.properties = prop
 
     def __getattr__(self, item):
+        # properties is read from __dict__, because it is not set yet when
+        # an element is unpickled
         try:
-            return self.properties[item]
+            return self.__dict__['properties'][item]
         except KeyError:
             raise AttributeError
 
@@ -157,9 +244,12 @@ class TiledMap(TiledElement):
     reserved = "visible version orientation width height tilewidth \
                 tileheight properties tileset layer objectgroup".split()
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, index_gids=False, lazy=False):
         """
         :param filename: filename of tiled map to load
+        :param index_gids: if true, tile layers index where each GID is used
+        :param lazy: if true, the file is read with iterparse, and the tile
+        layers are decoded when they are first used.  see parse_stream
         """
         TiledElement.__init__(self)
         self.layers = []           # list of all layers in proper order
@@ -178,6 +268,14 @@ class TiledMap(TiledElement):
 
         # should be filled in by a loader function
         self.images = []
+        self.image_scale = 1  # images are this many times larger than tiles
+
+        # tile layers build a GID index when loaded, see TiledTileLayer
+        self.index_gids = index_gids
+
+        # journal of (x, y, layer) tiles changed by set_tile_gid
+        self.tile_changes = []
+        self.tile_changes_start = 0  # serial of the first change in journal
 
         # defaults from the TMX specification
         self.version = 0.0
@@ -191,7 +289,10 @@ class TiledMap(TiledElement):
         # initialize the gid mapping
         self.imagemap[(0, 0)] = 0
 
-        if filename:
+        if filename and lazy:
+            self.parse_stream(self.filename)
+
+        elif filename:
             # Parse a map node from a tiled tmx file
             node = ElementTree.parse(self.filename).getroot()
             self.parse(node)
@@ -199,6 +300,12 @@ class TiledMap(TiledElement):
     def __repr__(self):
         return '<{0}: "{1}">'.format(self.__class__.__name__, self.filename)
 
+    def __getstate__(self):
+        # images are not pickled, they must be loaded again
+        state = self.__dict__.copy()
+        state['images'] = []
+        return state
+
     # iterate over layers and objects in map
     def __iter__(self):
         return chain(self.layers, self.objects)
@@ -218,6 +325,48 @@ class TiledMap(TiledElement):
         for subnode in node.findall('layer'):
             self.add_layer(TiledTileLayer(self, subnode))
 
+        self.parse_after_tile_layers(node)
+
+    def parse_stream(self, source):
+        """Parse a map with iterparse, keeping the tile layers compressed
+
+        Each tile layer is parsed as soon as it is read, and its XML is
+        discarded, so the whole file is never held in memory.  The layers
+        keep their compressed data and decode it when first used.  The
+        other elements are small, and are parsed at the end, in the same
+        order as parse does.
+
+        :param source: filename or file object of the TMX data
+        """
+        root = None
+        depth = 0
+        for event, elem in ElementTree.iterparse(source, ('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    # the layers need the size of the map
+                    root = elem
+                    for k, v in root.items():
+                        setattr(self, k, types[str(k)](v))
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 1 and elem.tag == 'layer':
+                self.add_layer(TiledTileLayer(self, elem, True))
+                elem.clear()
+
+        self.set_properties(root)
+
+        self.background_color = root.get('backgroundcolor',
+                                         self.background_color)
+
+        self.parse_after_tile_layers(root)
+
+    def parse_after_tile_layers(self, node):
+        """Parse the elements of a map that must follow the tile layers
+
+        :param node: ElementTree xml node of the map
+        """
         for subnode in node.findall('imagelayer'):
             self.add_layer(TiledImageLayer(self, subnode))
 
@@ -305,15 +454,64 @@ class TiledMap(TiledElement):
             logger.debug(msg, (x, y, layer))
             raise ValueError
 
+    def get_tile_region(self, rect, layer):
+        """Return a tile layer and the part of a rect of tiles inside it
+
+        :param rect: (x, y, width, height) of the region, in tiles
+        :param layer: layer number of a tile layer
+        :rtype: (TiledTileLayer, left, top, right, bottom) tuple, raises \
+        ValueError if the layer is not a tile layer
+        """
+        try:
+            assert (int(layer) >= 0)
+            layer = self.layers[int(layer)]
+            assert (isinstance(layer, TiledTileLayer))
+        except (TypeError, ValueError, AssertionError, IndexError):
+            msg = "Layer must be the number of a tile layer.  Got {0}."
+            print(msg.format(layer))
+            raise ValueError
+
+        x, y, width, height = map(int, rect)
+        left, top = max(0, x), max(0, y)
+        right = max(left, min(layer.width, x + width))
+        bottom = max(top, min(layer.height, y + height))
+        return layer, left, top, right, bottom
+
+    def get_tile_gids(self, rect, layer):
+        """Return the GIDs of the tiles in a rect, clipped to the map
+
+        With numpy, the GIDs are a 2D array, indexed [y, x], that shares the
+        memory of the layer.  Without it, they are a list of rows.
+
+        :param rect: (x, y, width, height) of the region, in tiles
+        :param layer: layer number
+        :rtype: numpy array if numpy is installed, otherwise list of rows
+        """
+        layer, left, top, right, bottom = self.get_tile_region(rect, layer)
+        if numpy is not None:
+            return layer.as_array()[top:bottom, left:right]
+        return [row[left:right] for row in layer.data[top:bottom]]
+
     def get_tile_images(self, r, layer):
-        """Return iterator of images (not complete)
+        """Return the images of the tiles in a rect, clipped to the map
 
-        :param x: x coordinate
-        :param y: y coordinate
+        Empty tiles are skipped.  The tiles are returned row by row.
+
+        :param r: (x, y, width, height) of the region, in tiles
         :param layer: layer number
-        :rtype: pygame surface if found, otherwise ValueError
+        :rtype: iterator of (x, y, image) tuples
         """
-        raise NotImplementedError
+        layer, left, top, right, bottom = self.get_tile_region(r, layer)
+        images = self.images
+        if numpy is not None:
+            gids = layer.as_array()[top:bottom, left:right]
+            ys, xs = numpy.nonzero(gids)
+            return ((x + left, y + top, images[gid]) for x, y, gid in
+                    zip(xs.tolist(), ys.tolist(), gids[ys, xs].tolist()))
+
+        return ((x, y, images[row[x]])
+                for y, row in enumerate(layer.data[top:bottom], top)
+                for x in range(left, right) if row[x])
 
     def get_tile_properties(self, x, y, layer):
         """Return the tile image GID for this location
@@ -345,10 +543,68 @@ class TiledMap(TiledElement):
             except KeyError:
                 return None
 
+    def set_tile_gid(self, x, y, layer, gid):
+        """Set the GID of a tile, and record the change in the journal
+
+        :param x: x coordinate
+        :param y: y coordinate
+        :param layer: layer number
+        :param gid: GID that pytmx uses, not the GID found in the TMX data
+        :rtype: None, raises ValueError if the position or GID is invalid
+        """
+        try:
+            assert (x >= 0 and y >= 0 and layer >= 0 and gid >= 0)
+            assert (gid < len(self.images) or not self.images)
+            tile_layer = self.layers[int(layer)]
+            old_gid = tile_layer.data[int(y)][int(x)]
+            if old_gid == gid:
+                return
+            if gid >= 1 << (8 * tile_layer.gids.itemsize):
+                # widen the storage of the layer to hold the new gid
+                tile_layer.store_gids(tile_layer.gids, gid + 1)
+            tile_layer.data[int(y)][int(x)] = gid
+            tile_layer.update_gid_index(int(x), int(y), old_gid, gid)
+        except (AssertionError, AttributeError, IndexError, OverflowError):
+            msg = "Cannot set GID {3} at ({0},{1}) in layer {2}"
+            logger.debug(msg.format(x, y, layer, gid))
+            raise ValueError
+
+        self.tile_changes.append((int(x), int(y), int(layer)))
+
+    @property
+    def tile_change_serial(self):
+        """Serial number of the next change to the tiles
+
+        :rtype: int
+        """
+        return self.tile_changes_start + len(self.tile_changes)
+
+    def get_tile_changes(self, serial):
+        """Get the tiles changed by set_tile_gid since a serial number
+
+        :param serial: value of tile_change_serial when last checked
+        :rtype: list of (x, y, layer) tuples, or None if the changes were \
+        trimmed from the journal
+        """
+        if serial < self.tile_changes_start:
+            return None
+        return self.tile_changes[serial - self.tile_changes_start:]
+
+    def trim_tile_changes(self, serial):
+        """Remove the changes before a serial number from the journal
+
+        :param serial: changes older than this are forgotten
+        """
+        count = min(serial - self.tile_changes_start, len(self.tile_changes))
+        if count > 0:
+            del self.tile_changes[:count]
+            self.tile_changes_start += count
+
     def get_tile_locations_by_gid(self, gid):
         """Search map for tile locations by the GID
 
-        Not a fast operation
+        Fast if the layers have a GID index, or with numpy, which searches
+        each layer at once
 
         :param gid: GID to be searched for
         :rtype: generator of tile locations
@@ -360,12 +616,11 @@ class TiledMap(TiledElement):
         except:
             raise
 
-        p = product(range(self.width),
-                    range(self.height),
-                    range(len(self.layers)))
-
-        return ((x, y, l) for (x, y, l) in p if
-                self.layers[l].data[y][x] == gid)
+        # locations are sorted by x, then y, then layer
+        found = sorted((x, y, l) for l, layer in enumerate(self.layers)
+                       if isinstance(layer, TiledTileLayer)
+                       for x, y in layer.get_tile_locations_by_gid(gid))
+        return (location for location in found)
 
     def get_tile_properties_by_gid(self, gid):
         """Get the tile properties of a tile GID
@@ -401,8 +656,11 @@ class TiledMap(TiledElement):
             print(msg.format(type(layer)))
             raise ValueError
 
-        p = product(range(self.width), range(self.height))
-        layergids = set(self.layers[layer].data[y][x] for x, y in p)
+        layer = self.layers[layer]
+        if numpy is not None:
+            layergids = numpy.unique(layer.as_array()).tolist()
+        else:
+            layergids = set(chain.from_iterable(layer.data))
 
         for gid in layergids:
             try:
@@ -410,6 +668,41 @@ class TiledMap(TiledElement):
             except KeyError:
                 continue
 
+    def get_tile_mask_by_gid(self, gid, layer, rect=None):
+        """Return a mask of the tiles in a layer that have some GIDs
+
+        :param gid: GID, or collection of GIDs, to be searched for
+        :param layer: layer number
+        :param rect: (x, y, width, height) of the region, or the whole layer
+        :rtype: 2D numpy array of bools if numpy is installed, otherwise \
+        list of rows of bools
+        """
+        if rect is None:
+            rect = 0, 0, self.width, self.height
+        gids = self.get_tile_gids(rect, layer)
+        try:
+            gid = set(gid)
+        except TypeError:
+            gid = {gid}
+
+        if numpy is not None:
+            return numpy.isin(gids, list(gid))
+        return [[value in gid for value in row] for row in gids]
+
+    def get_tile_mask_by_property(self, name, layer, value=None, rect=None):
+        """Return a mask of the tiles in a layer that have a property
+
+        :param name: name of the property
+        :param layer: layer number
+        :param value: if not None, the value the property must have
+        :param rect: (x, y, width, height) of the region, or the whole layer
+        :rtype: 2D numpy array of bools if numpy is installed, otherwise \
+        list of rows of bools
+        """
+        gids = [gid for gid, props in self.tile_properties.items()
+                if name in props and (value is None or props[name] == value)]
+        return self.get_tile_mask_by_gid(gids, layer, rect)
+
     def add_layer(self, layer):
         """Add a layer (TileTileLayer, TiledImageLayer, or TiledObjectGroup)
 
@@ -547,6 +840,8 @@ class TiledTileset(TiledElement):
         TiledElement.__init__(self)
         self.parent = parent
 
+        self.filename = None  # filename of the TSX file, if external
+
         # defaults from the specification
         self.firstgid = 0
         self.source = None
@@ -584,6 +879,7 @@ class TiledTileset(TiledElement):
                 path = os.path.abspath(os.path.join(dirname, source))
                 try:
                     node = ElementTree.parse(path).getroot()
+                    self.filename = path
                 except IOError:
                     msg = "Cannot load external tileset: {0}"
                     print(msg.format(path))
@@ -598,7 +894,7 @@ class TiledTileset(TiledElement):
 
         # since tile objects [probably] don't have a lot of metadata,
         # we store it separately in the parent (a TiledMap instance)
-        for child in node.getiterator('tile'):
+        for child in node.iter('tile'):
             real_gid = int(child.get("id"))
             p = parse_properties(child)
 
@@ -613,7 +909,18 @@ class TiledTileset(TiledElement):
                 p['width'] = image.get('width')
                 p['height'] = image.get('height')
 
+            # the frames of animated tiles are stored in the 'frames'
+            # property as a list of AnimationFrames.  frames are registered
+            # with the flags of the tile, so they are loaded flipped the same
+            animation = child.find('animation')
             for gid, flags in self.parent.map_gid(real_gid + self.firstgid):
+                if animation is not None:
+                    p = dict(p)
+                    p['frames'] = [AnimationFrame(
+                        self.parent.register_gid(
+                            int(frame.get('tileid')) + self.firstgid, flags),
+                        int(frame.get('duration')))
+                        for frame in animation.findall('frame')]
                 self.parent.set_tile_properties(gid, p)
 
         # handle the optional 'tileoffset' node
@@ -638,10 +945,15 @@ class TiledTileLayer(TiledElement):
     """
     reserved = "visible name x y width height opacity properties data".split()
 
-    def __init__(self, parent, node):
+    def __init__(self, parent, node, lazy=False):
         TiledElement.__init__(self)
         self.parent = parent
+        self.gids = array.array('B')
         self.data = []
+        self.gid_index = None  # GID => array of cells, see build_gid_index
+        self.lazy = lazy
+        self.payload = None  # compressed data of a lazy layer, see decode
+        self.decode_lock = threading.RLock()
 
         # defaults from the specification
         self.name = None
@@ -655,6 +967,27 @@ class TiledTileLayer(TiledElement):
     def __iter__(self):
         return self.iter_tiles()
 
+    def __getattr__(self, item):
+        # the data of a lazy layer is decoded the first time it is used
+        if item in ('data', 'gids') and \
+                self.__dict__.get('payload') is not None:
+            self.decode()
+            return self.__dict__[item]
+        return TiledElement.__getattr__(self, item)
+
+    def __getstate__(self):
+        # the rows are views of gids, so they are made again when unpickled
+        state = self.__dict__.copy()
+        state.pop('data', None)
+        state.pop('decode_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.decode_lock = threading.RLock()
+        if 'gids' in state:
+            self.set_rows()
+
     def iter_tiles(self):
         for y, x in product(range(self.height), range(self.width)):
             yield x, y, self.data[y][x]
@@ -664,9 +997,6 @@ class TiledTileLayer(TiledElement):
 
         :param node: ElementTree xml node
         """
-        import struct
-        import array
-
         self.set_properties(node)
 
         data = None
@@ -690,17 +1020,7 @@ class TiledTileLayer(TiledElement):
             raise Exception
 
         compression = data_node.get('compression', None)
-        if compression == 'gzip':
-            # py3 => bytes
-            import gzip
-            with gzip.GzipFile(fileobj=six.BytesIO(data)) as fh:
-                data = fh.read()
-
-        elif compression == 'zlib':
-            import zlib
-            data = zlib.decompress(data)
-
-        elif compression:
+        if compression not in (None, 'gzip', 'zlib'):
             msg = 'TMX compression type: {0} is not supported.'
             print(msg.format(compression))
             raise Exception
@@ -714,23 +1034,195 @@ class TiledTileLayer(TiledElement):
                     yield int(child.get('gid'))
             next_gid = get_children(data_node)
 
-        elif data:
+        # the gids of every cell, row by row, as they are in the TMX data
+        if next_gid is None and data:
             if type(data) == bytes:
-                fmt = struct.Struct('<L')
-                iterator = (data[i:i+4] for i in range(0, len(data), 4))
-                next_gid = (fmt.unpack(i)[0] for i in iterator)
+                raw_gids = self.read_payload(data, compression)
             else:
                 print(type(data))
                 raise Exception
+        else:
+            raw_gids = self.check_count(list(next_gid))
+
+        if self.lazy and next_gid is None:
+            # the gids are registered now, so they are numbered the same as
+            # if the layer was decoded, but it is stored compressed
+            register_gids(self.parent.register_gid, raw_gids, True)
+            self.payload = data, compression, self.parent.maxgid
+            del self.gids, self.data
+            return
+
+        gids = register_gids(self.parent.register_gid, raw_gids)
+        self.store_gids(gids, self.parent.maxgid)
+        if getattr(self.parent, 'index_gids', False):
+            self.build_gid_index()
+
+    def read_payload(self, data, compression):
+        """Return the gids, as they are in the TMX data, of base64 data
+
+        :param data: bytes of the data, after base64 decoding
+        :param compression: 'gzip', 'zlib' or None
+        :rtype: array of gids
+        """
+        if compression == 'gzip':
+            # py3 => bytes
+            import gzip
+            with gzip.GzipFile(fileobj=six.BytesIO(data)) as fh:
+                data = fh.read()
+
+        elif compression == 'zlib':
+            import zlib
+            data = zlib.decompress(data)
+
+        return self.check_count(read_gids(data))
+
+    def check_count(self, raw_gids):
+        """Return the gids of the cells of the layer, or raise if too few
+        """
+        count = self.width * self.height
+        if len(raw_gids) < count:
+            msg = 'Layer {0} has {1} tiles, but it should have {2}'
+            print(msg.format(self.name, len(raw_gids), count))
+            raise Exception
+        return raw_gids[:count]
+
+    def decode(self):
+        """Decode the compressed data of a lazy layer
+
+        Called when data or gids of the layer is first used.  The gids were
+        registered when the layer was parsed, so none are new.  The layer is
+        decoded under decode_lock, and payload is cleared only once the data
+        is stored, so other threads wait for it, and if the payload cannot be
+        read, the error is raised again the next time the data is used.
+        """
+        with self.decode_lock:
+            if self.payload is None:
+                return
+            data, compression, maxgid = self.payload
+            raw_gids = self.read_payload(data, compression)
+            self.store_gids(register_gids(self.parent.register_gid, raw_gids),
+                            maxgid)
+            if getattr(self.parent, 'index_gids', False):
+                self.build_gid_index()
+            self.payload = None
+
+    def store_gids(self, gids, maxgid):
+        """Store the gids of the layer, row by row, in one contiguous array
+
+        The typecode of the array is the smallest that can hold maxgid, and
+        each row of self.data is a view of the array, so data[y][x] gets and
+        sets the gid of a tile without copying.
+
+        :param gids: sequence of pytmx gids of every cell, row by row
+        :param maxgid: one more than the largest gid that will be stored
+        """
+        typecode = gid_typecode(maxgid)
+        if numpy is not None and isinstance(gids, numpy.ndarray):
+            self.gids = array.array(typecode, gids.astype(typecode).tobytes())
+        else:
+            self.gids = array.array(typecode, gids)
+        self.set_rows()
+
+    def set_rows(self):
+        """Make the rows of self.data, as views of self.gids
+        """
+        width = self.width
+        try:
+            view = memoryview(self.gids)
+        except TypeError:
+            # python 2 arrays do not export buffers, so the rows are copies
+            view = self.gids
+        self.data = tuple(view[y * width:(y + 1) * width]
+                          for y in range(self.height))
+
+    def as_array(self):
+        """Return a 2D numpy array of the gids that shares the layer memory
+
+        The array is indexed as [y, x].  Tiles set through the array are not
+        recorded in the change journal of the map; use set_tile_gid for that.
+        set_tile_gid may widen the storage for a larger gid, and arrays
+        returned before that no longer share the layer memory.
+
+        :rtype: numpy.ndarray, raises ImportError if numpy is not installed
+        """
+        if numpy is None:
+            raise ImportError('as_array requires numpy')
+        return numpy.frombuffer(self.gids, dtype=self.gids.typecode).reshape(
+            self.height, self.width)
+
+    def build_gid_index(self):
+        """Build the index of the cells where each GID is used
+
+        gid_index maps each GID, except 0, to an array of the cells that
+        have it, in order.  A cell is y * width + x.  Once built, the index
+        is kept up to date by TiledMap.set_tile_gid.
+        """
+        typecode = gid_typecode(self.width * self.height)
+        self.gid_index = dict()
+        if numpy is not None:
+            gids = self.as_array().ravel()
+            cells = numpy.argsort(gids, kind='mergesort')
+            values, starts = numpy.unique(gids[cells], return_index=True)
+            stops = chain(starts[1:].tolist(), [len(cells)])
+            for gid, start, stop in zip(values.tolist(), starts.tolist(),
+                                        stops):
+                if gid:
+                    self.gid_index[gid] = array.array(
+                        typecode, cells[start:stop].astype(typecode).tobytes())
+            return
+
+        for cell, gid in enumerate(chain.from_iterable(self.data)):
+            if gid:
+                try:
+                    self.gid_index[gid].append(cell)
+                except KeyError:
+                    self.gid_index[gid] = array.array(typecode, [cell])
+
+    def update_gid_index(self, x, y, old_gid, gid):
+        """Move a cell in the GID index, if it is built
+
+        :param x: x coordinate
+        :param y: y coordinate
+        :param old_gid: GID the cell had
+        :param gid: GID the cell has now
+        """
+        if self.gid_index is None:
+            return
+
+        cell = y * self.width + x
+        if old_gid:
+            cells = self.gid_index[old_gid]
+            del cells[bisect_left(cells, cell)]
+            if not cells:
+                del self.gid_index[old_gid]
+        if gid:
+            try:
+                cells = self.gid_index[gid]
+            except KeyError:
+                typecode = gid_typecode(self.width * self.height)
+                cells = self.gid_index[gid] = array.array(typecode)
+            cells.insert(bisect_left(cells, cell), cell)
+
+    def get_tile_locations_by_gid(self, gid):
+        """Return the locations of the tiles that have a GID, row by row
+
+        Uses the GID index if it is built, otherwise searches the layer.
+        GID 0, the empty cells, is not indexed, so it is always searched.
+
+        :param gid: GID to be searched for
+        :rtype: list of (x, y) tuples
+        """
+        width = self.width
+        if self.gid_index is not None and gid:
+            return [(cell % width, cell // width)
+                    for cell in self.gid_index.get(gid, ())]
 
-        def init():
-            return [0] * self.width
-        reg = self.parent.register_gid
+        if numpy is not None:
+            ys, xs = numpy.nonzero(self.as_array() == gid)
+            return list(zip(xs.tolist(), ys.tolist()))
 
-        # H (16-bit) may be a limitation for very detailed maps
-        self.data = tuple(array.array('H', init()) for i in range(self.height))
-        for (y, x) in product(range(self.height), range(self.width)):
-            self.data[y][x] = reg(*decode_gid(next(next_gid)))
+        return [(x, y) for y, row in enumerate(self.data) if gid in row
+                for x, value in enumerate(row) if value == gid]
 
 
 class TiledObject(TiledElement):
@@ -16,12 +16,25 @@ New in 3.19:
       core: polygon/polyline and all other shapes return coordinates as float
       core: pytmx respects tiles that specify external image: stored in metadata
       core: tileoffsets are loaded stored in tileset.offset: tuple: (x, y)
+      core: tile animations are loaded into the 'frames' tile property
+      core: tile layers are decoded in bulk, faster with numpy if installed
+      core: tile layers are stored in one array sized for the gids, as_array()
+      core: vectorized tile queries: get_tile_gids, masks, get_tile_images
+      core: optional index of the cells of each gid, index_gids=True
+      core: parsed maps can be cached in a binary file, see pytmx.cache
+      core: streaming loader, tile layers decoded when first used, lazy=True
+    pygame: tile images can be made when first used, see TileImages
     pygame: tilesets can be loaded even if they don't specify an image
     pygame: loading of tiles that specify an external image is supported
     pygame: new optional arguments for load_pygame():
             load_all: bool (False is default), load al tiles, even unused ones
             optional_gids: list/tuple, also load the gids in this list
             === 'gid' refers to the gid found in tiled
+            scale: int (1 is default), scale images up when loaded
+            index_gids: bool (False is default), index the cells of each gid
+            cache: bool (False is default), use a cache of the parsed map
+            lazy: bool (False is default), decode tile layers when first used
+            lazy_images: bool (False is default), make tiles when first used
 
 New in 3.18:
     pygame: removed option for force a colorkey for a tileset
@@ -202,12 +215,20 @@ Z: minor release.  for bug fixes related to last release
 """
 import itertools
 import os
+import threading
 import pygame
 import pytmx
 from pygame.transform import flip, rotate
+from .cache import load_tmx
 from .constants import *
 
-__all__ = ['load_pygame']
+# numpy is optional, and makes ordering the tiles for warm up faster
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['load_pygame', 'TileImages', 'warm_up_images']
 
 
 def handle_transformation(tile, flags):
@@ -234,6 +255,15 @@ def handle_transformation(tile, flags):
         return tile
 
 
+def scale_image(image, scale):
+    """ Return the image made larger by an integer factor
+    """
+    if scale == 1:
+        return image
+    w, h = image.get_size()
+    return pygame.transform.scale(image, (w * scale, h * scale))
+
+
 def smart_convert(original, colorkey, pixelalpha):
     """
     this method does several tests on a surface to determine the optimal
@@ -270,6 +300,138 @@ def smart_convert(original, colorkey, pixelalpha):
     return tile
 
 
+class TileImages(list):
+    """ Tile images that are made when they are first used
+
+    Used as the images of a map by load_pygame when lazy_images is true.  It
+    is a list like the one made when the images are loaded up front, but the
+    tiles of the tilesets are only cut, transformed, scaled and converted
+    the first time they are read.  Until then their slot holds None.
+
+    Tiles are made under a lock, so warm_up_images can make them in another
+    thread while the map is drawn.
+    """
+
+    def __init__(self, size, scale=1, pixelalpha=True):
+        list.__init__(self, [0] * size)
+        self.scale = scale
+        self.pixelalpha = pixelalpha
+        self.pending = dict()  # gid => (image, rect, flags, colorkey)
+        self.lock = threading.Lock()
+
+    def __getitem__(self, gid):
+        image = list.__getitem__(self, gid)
+        if image is None:
+            image = self.load(gid)
+        return image
+
+    def __setitem__(self, gid, image):
+        if not isinstance(gid, slice):
+            self.pending.pop(gid, None)
+        list.__setitem__(self, gid, image)
+
+    def __iter__(self):
+        return (self[gid] for gid in range(len(self)))
+
+    def add(self, gid, image, rect, flags, colorkey):
+        """ Make the tile for a gid from a part of an image when it is used
+        """
+        self.pending[gid] = image, rect, flags, colorkey
+        list.__setitem__(self, gid, None)
+
+    def load(self, gid):
+        """ Make the tile for a gid, if it is not made yet, and return it
+        """
+        with self.lock:
+            tile = list.__getitem__(self, gid)
+            if tile is None:
+                image, rect, flags, colorkey = self.pending.pop(gid)
+                tile = handle_transformation(image.subsurface(rect), flags)
+                tile = scale_image(tile, self.scale)
+                tile = smart_convert(tile, colorkey, self.pixelalpha)
+                list.__setitem__(self, gid, tile)
+        return tile
+
+    def load_all(self, gids=()):
+        """ Make every tile that is not made yet; gids are made first
+        """
+        for gid in itertools.chain(gids, sorted(self.pending)):
+            if list.__getitem__(self, gid) is None:
+                self.load(gid)
+
+
+def gids_by_distance(tmxdata, position):
+    """ Return the gids used in the map, nearest to a position first
+
+    The distance of a gid is from position to the nearest cell that has it,
+    in the visible tile layers.  Lazy layers that are not decoded yet are
+    skipped.
+
+    :param position: x, y in tiles
+    :rtype: list of gids
+    """
+    # the main thread may be decoding a layer, so check under its lock
+    layers = list()
+    for layer in tmxdata.layers:
+        if isinstance(layer, pytmx.TiledTileLayer) and layer.visible:
+            with layer.decode_lock:
+                if layer.payload is None:
+                    layers.append(layer)
+
+    px, py = position
+    nearest = dict()
+    for layer in layers:
+        if numpy is not None:
+            gids = layer.as_array()
+            ys, xs = numpy.nonzero(gids)
+            distances = (xs - px) ** 2 + (ys - py) ** 2
+            order = numpy.argsort(distances, kind='mergesort')
+            values, first = numpy.unique(gids[ys, xs][order],
+                                         return_index=True)
+            found = zip(values.tolist(), distances[order][first].tolist())
+        else:
+            found = dict()
+            for y, row in enumerate(layer.data):
+                dy = (y - py) ** 2
+                for x, gid in enumerate(row):
+                    if gid:
+                        distance = (x - px) ** 2 + dy
+                        if distance < found.get(gid, distance + 1):
+                            found[gid] = distance
+            found = found.items()
+
+        for gid, distance in found:
+            if distance < nearest.get(gid, distance + 1):
+                nearest[gid] = distance
+
+    return sorted(nearest, key=nearest.get)
+
+
+def warm_up_images(tmxdata, position=None):
+    """ Make the tiles of a map loaded with lazy_images in a thread
+
+    The tiles used nearest position, (x, y) in tiles, are made first, then
+    the rest.  Tiles that are drawn before the thread gets to them are made
+    when they are drawn.
+
+    :rtype: the daemon thread, or None if the images are not lazy
+    """
+    images = tmxdata.images
+    if not isinstance(images, TileImages):
+        return None
+
+    def run():
+        gids = ()
+        if position is not None:
+            gids = gids_by_distance(tmxdata, position)
+        images.load_all(gids)
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
 def _load_images_pygame(tmxdata, mapping, *args, **kwargs):
     """  Utility function to load images.  Used internally!
     """
@@ -278,13 +440,19 @@ def _load_images_pygame(tmxdata, mapping, *args, **kwargs):
     pixelalpha = kwargs.get('pixelalpha', True)
     optional_gids = kwargs.get('optional_gids', None)
     load_all_tiles = kwargs.get('load_all', False)
+    lazy_images = kwargs.get('lazy_images', False)
+    scale = int(kwargs.get('scale', 1))
+    tmxdata.image_scale = scale
 
     # change background color into something nice
     if tmxdata.background_color:
         tmxdata.background_color = pygame.Color(tmxdata.background_color)
 
     # initialize the array of images
-    tmxdata.images = [0] * tmxdata.maxgid
+    if lazy_images:
+        tmxdata.images = TileImages(tmxdata.maxgid, scale, pixelalpha)
+    else:
+        tmxdata.images = [0] * tmxdata.maxgid
 
     # load tileset image
     for ts in tmxdata.tilesets:
@@ -332,11 +500,17 @@ def _load_images_pygame(tmxdata, mapping, *args, **kwargs):
                     # TODO: handle flags? - might never be an issue, though
                     gids = [tmxdata.register_gid(real_gid, flags=0)]
 
-            if gids:
+            if gids and lazy_images:
+                for gid, flags in gids:
+                    tmxdata.images.add(gid, image, ((x, y), tile_size),
+                                       flags, colorkey)
+
+            elif gids:
                 original = image.subsurface(((x, y), tile_size))
 
                 for gid, flags in gids:
                     tile = handle_transformation(original, flags)
+                    tile = scale_image(tile, scale)
                     tile = smart_convert(tile, colorkey, pixelalpha)
                     tmxdata.images[gid] = tile
 
@@ -353,7 +527,7 @@ def _load_images_pygame(tmxdata, mapping, *args, **kwargs):
                 gid = tmxdata.register_gid(real_gid)
                 layer.gid = gid
                 path = os.path.join(os.path.dirname(tmxdata.filename), source)
-                image = pygame.image.load(path)
+                image = scale_image(pygame.image.load(path), scale)
                 image = smart_convert(image, colorkey, pixelalpha)
                 tmxdata.images.append(image)
 
@@ -365,7 +539,7 @@ def _load_images_pygame(tmxdata, mapping, *args, **kwargs):
         if source:
             colorkey = props.get('trans', None)
             path = os.path.join(os.path.dirname(tmxdata.filename), source)
-            image = pygame.image.load(path)
+            image = scale_image(pygame.image.load(path), scale)
             image = smart_convert(image, colorkey, pixelalpha)
             tmxdata.images[real_gid] = image
 
@@ -387,11 +561,35 @@ def load_pygame(filename, *args, **kwargs):
     transparency set in Tiled, the loader will return images that have their
     transparency already set.
 
+    if scale is passed, all the images are scaled up by that integer factor.
+    the map keeps its size and coordinates; the factor is stored in the
+    image_scale attribute of the map.
+
+    if index_gids is true, each tile layer indexes the cells where each gid
+    is used, so searching the map for a gid is fast.
+
+    if cache is true, the parsed map is stored in a file in the cache
+    directory of the user, and loaded from there until the map or its
+    tilesets change.  see pytmx.cache.
+
+    if lazy is true, the file is streamed, and each tile layer is kept
+    compressed until it is first used.  hidden layers that are not used are
+    never decoded.
+
+    if lazy_images is true, each tile image is made the first time it is
+    used, instead of when the map is loaded.  warm_up_images can make the
+    rest in a background thread, nearest the camera first.
+
     TL;DR:
     Don't attempt to convert() or convert_alpha() the individual tiles.  It is
     already done for you.
     """
-    tmxdata = pytmx.TiledMap(filename)
+    index_gids = kwargs.get('index_gids', False)
+    lazy = kwargs.get('lazy', False)
+    if kwargs.get('cache', False):
+        tmxdata = load_tmx(filename, index_gids, lazy)
+    else:
+        tmxdata = pytmx.TiledMap(filename, index_gids, lazy)
     _load_images_pygame(tmxdata, None, *args, **kwargs)
     return tmxdata
 
@@ -5,6 +5,7 @@ import pygame
 import pymunk
 import threading
 from pymunktmx.shapeloader import load_shapes
+from pytmx.tmxloader import warm_up_images
 from six.moves import range, queue
 from pygame.locals import *
 
@@ -27,18 +28,37 @@ def ignore_gravity(body, gravity, damping, dt):
 
 
 def blit_thread(queue, screen, lock):
-    screen_size = screen.get_size()
-    scale = pygame.transform.scale
+    """ copy frames to the screen
+
+    the queue gets (surface, dirty) tuples.  if dirty is None, the whole
+    surface is copied and the display is flipped, otherwise only the dirty
+    rects of the surface are copied and updated.
+    """
+    screen_rect = screen.get_rect()
+    blit = screen.blit
     flip = pygame.display.flip
+    update = pygame.display.update
     while 1:
-        surface = queue.get()
-        if surface is None:
+        item = queue.get()
+        if item is None:
             break
-        else:
+
+        surface, dirty = item
+        if dirty is None:
             with lock:
-                scale(surface, screen_size, screen)
+                blit(surface, (0, 0))
             flip()
 
+        elif dirty:
+            updated = list()
+            with lock:
+                for rect in dirty:
+                    rect = screen_rect.clip(rect)
+                    if rect:
+                        blit(surface, rect, rect)
+                        updated.append(rect)
+            update(updated)
+
 class Game(object):
     def __init__(self):
         self.states = []
@@ -53,9 +73,10 @@ class Game(object):
     def run(self):
         clock = pygame.time.Clock()
         screen = pygame.display.get_surface()
-        screen_size = screen.get_size()
-        surface = pygame.Surface([int(i / 2) for i in screen_size])
-        scale = pygame.transform.scale
+        # the map and sprites are scaled when loaded, so the frame is drawn
+        # at the size of the screen
+        surface = pygame.Surface(screen.get_size())
+        scale = config.getint('display', 'scale')
         target_fps = config.getint('display', 'target-fps')
         running = True
 
@@ -67,12 +88,12 @@ class Game(object):
         t.start()
 
         level_rect = surface.get_rect()
-        hud_group = pygame.sprite.RenderUpdates()
+        hud_group = ui.DirtyUpdates()
 
         # add stuff to the hud
         c = (255, 255, 255)
         bg = (0, 0, 0)
-        s = ui.TextSprite(self.score, c, bg)
+        s = ui.TextSprite(self.score, c, bg, 12 * scale)
         s.rect.topleft = (0, 0)
         hud_group.add(s)
 
@@ -91,9 +112,9 @@ class Game(object):
                 state.update(dt)
                 hud_group.update()
                 with lock:
-                    state.draw(surface, level_rect)
-                    hud_group.draw(surface)
-                screen_queue.put(surface)
+                    dirty = state.draw(surface, level_rect)
+                    dirty.extend(hud_group.draw(surface))
+                screen_queue.put((surface, dirty))
                 running = state.running
 
         except KeyboardInterrupt:
@@ -109,21 +130,18 @@ class Level(object):
         self.running = False
         self.models = set()
         self.sanic = None
-        self.bg = None
         self.models_lock = threading.Lock()
         self.hud_group = pygame.sprite.Group()
         self._add_queue = set()
         self._remove_queue = set()
         self.timestep = config.getfloat('world', 'timestep')
-        self.draw_background = config.getboolean('display', 'draw-background')
-        if self.draw_background:
-            self.bg = resources.images['default-bg']
 
         self.keyboard_input = playerinput.KeyboardPlayerInput()
 
         self.tmx_data = resources.maps['level0']
         self.map_data = pyscroll.TiledMapData(self.tmx_data)
-        self.map_height = self.map_data.height * self.map_data.tileheight
+        # the physics are in map units, not the scaled pixels of map_data
+        self.map_height = self.tmx_data.height * self.tmx_data.tileheight
 
         # manually set all objects in the traps layer to trap collision type
         for layer in self.tmx_data.objectgroups:
@@ -147,7 +165,8 @@ class Level(object):
 
         # load the vp group and the single vp for level drawing
         self.vpgroup = sprite.ViewPortGroup(self.space, self.map_data)
-        self.vp = sprite.ViewPort()
+        chunked = config.getboolean('display', 'chunked-map')
+        self.vp = sprite.ViewPort(chunked)
         self.vpgroup.add(self.vp)
 
         # set collision types for custom objects
@@ -165,6 +184,13 @@ class Level(object):
 
         self.new_sanic()
 
+        # the map tiles are made when first drawn; make the rest in the
+        # background, starting with the ones near sanic
+        x, y = self.sanic.position
+        tx = int(x // self.tmx_data.tilewidth)
+        ty = int((self.map_height - y) // self.tmx_data.tileheight)
+        warm_up_images(self.tmx_data, (tx, ty))
+
     def handle_stairs(self, shape):
         logger.info('loading stairs %s', shape)
 
@@ -201,7 +227,9 @@ class Level(object):
 
         gids = [self.tmx_data.map_gid(i)[0][0] for i in (1, 2, 3)]
         colorkey = (255, 0, 255)
-        tile_width = self.tmx_data.tilewidth
+        scale = self.tmx_data.image_scale
+        tile_width = self.tmx_data.tilewidth * scale
+        rect = pygame.Rect(0, 0, rect.width * scale, rect.height * scale)
 
         s = pygame.Surface((rect.width, rect.height))
         s.set_colorkey(colorkey)
@@ -277,18 +305,9 @@ class Level(object):
             self._remove_queue.add(model)
 
     def draw(self, surface, rect):
-        # draw the background
-        if self.draw_background:
-            left, top = rect.topleft
-            surface.set_clip(rect)
-            surface.blit(self.bg, (left, top))
-            surface.blit(self.bg, (self.bg.get_width(), top))
-        surface.set_clip(None)
-
-        # draw the world
-        self.vpgroup.draw(surface, rect)
-
-        return rect
+        # backgrounds are map layers with a parallax property, and are
+        # drawn with the world by the map renderer
+        return self.vpgroup.draw(surface, rect)
 
     def handle_input(self):
         pressed = pygame.key.get_pressed()
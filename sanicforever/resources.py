@@ -53,10 +53,12 @@ def load():
         images[name] = image
         yield image
 
+    scale = config.getint('display', 'scale')
     for name, filename in config.items('map-files'):
         path = _jpath(resource_path, 'maps', filename)
         logger.info("loading %s", path)
-        map = pytmx.tmxloader.load_pygame(path)
+        map = pytmx.tmxloader.load_pygame(path, scale=scale, cache=True,
+                                          lazy_images=True)
         maps[name] = map
         yield map
 
@@ -40,6 +40,7 @@ class SanicForeverSprite(pygame.sprite.Sprite):
         self.original_surface = None
         self.current_animation = []
         self.speed_modifier = 1
+        self.scale = config.getint('display', 'scale')
 
     def __del__(self):
         logger.info("garbage collecting %s", self)
@@ -63,13 +64,16 @@ class SanicForeverSprite(pygame.sprite.Sprite):
             cls.animations = dict()
             cls.loaded = True
             s = resources.images[cls.sprite_sheet]
+            k = config.getint('display', 'scale')
 
             for name, ttl, func, tiles in cls.image_animations:
                 frames = []
                 for x1, y1, w, h, ax, ay in tiles:
-                    axis = pymunk.Vec2d(ax, ay)
+                    axis = pymunk.Vec2d(ax * k, ay * k)
                     image = pygame.Surface((w, h))
                     image.blit(s, (0, 0), (x1, y1, w, h))
+                    if k != 1:
+                        image = pygame.transform.scale(image, (w * k, h * k))
                     image.set_colorkey(image.get_at((0, 0)))
                     frames.append((image, axis))
                 cls.animations[name] = ttl, func, frames
@@ -96,7 +100,7 @@ class SanicForeverSprite(pygame.sprite.Sprite):
             self.rect = image.get_rect()
             self._old_angle = angle
             self.dirty = False
-        self.rect.center = self.shape.body.position
+        self.rect.center = self.shape.body.position * self.scale
 
     def update(self, dt):
         if self.animation_timer > 0:
@@ -169,11 +173,14 @@ class BoxSprite(SanicForeverSprite):
 
         self.shape.cache_bb()
         bb = self.shape.bb
-        self.rect.topleft = bb.left, bb.bottom
+        self.rect.topleft = bb.left * self.scale, bb.bottom * self.scale
 
 
 class ViewPortGroup(pygame.sprite.Group):
     """ viewports can be attached
+
+    the viewports share the caches of composited tiles, map chunks and
+    objects, so only the scrolled buffer of each camera is their own.
     """
 
     def __init__(self, space, map_data):
@@ -182,6 +189,10 @@ class ViewPortGroup(pygame.sprite.Group):
         self.map_data = map_data
         self.viewports = OrderedDict()
         self.rect = None
+        self.colorkey = (128, 64, 128)
+        self.tile_cache = pyscroll.TileStackCache(map_data, self.colorkey)
+        self.chunk_cache = pyscroll.ChunkCache()
+        self.object_cache = pyscroll.ChunkCache()
 
     def set_rect(self, rect):
         self.rect = rect
@@ -219,9 +230,14 @@ class ViewPortGroup(pygame.sprite.Group):
             vp.update(delta)
 
     def draw(self, surface, rect):
+        """ draw each viewport and return a list of the dirty rects
+        """
         if rect is not self.rect:
             self.set_rect(rect)
-        return [vp.draw(surface, r) for vp, r in self.viewports.items()]
+        dirty = list()
+        for vp, r in self.viewports.items():
+            dirty.extend(vp.draw(surface, r))
+        return dirty
 
     def add_internal(self, sprite):
         if isinstance(sprite, ViewPort):
@@ -251,16 +267,20 @@ class ViewPortGroup(pygame.sprite.Group):
 
 class ViewPort(pygame.sprite.Sprite):
     """ Draws a simulation
+
+    if chunked is true, the map is drawn with the pyscroll ChunkedRenderer
     """
 
-    def __init__(self):
+    def __init__(self, chunked=False):
         super(ViewPort, self).__init__()
+        self.chunked = chunked
         self.parent = None
         self.rect = None
         self.camera_vector = None
         self.map_layer = None
         self.map_height = None
         self.following = None
+        self.scale = config.getint('display', 'scale')
 
         self.draw_sprites = config.getboolean('display', 'draw-sprites')
         self.draw_map = config.getboolean('display', 'draw-map')
@@ -270,19 +290,31 @@ class ViewPort(pygame.sprite.Sprite):
     def set_rect(self, rect):
         self.rect = pygame.Rect(rect)
         md = self.parent.map_data
-        colorkey = (128, 64, 128)
-        self.map_layer = pyscroll.BufferedRenderer(
-            md, self.rect.size, colorkey, 2, True)
+        colorkey = self.parent.colorkey
+        tile_cache = self.parent.tile_cache
+        if self.map_layer is not None:
+            # keep what was drawn, and only draw the exposed cells
+            self.map_layer.resize(self.rect.size)
+        elif self.chunked:
+            # the chunks are kept when the viewport is resized
+            self.map_layer = pyscroll.ChunkedRenderer(
+                md, self.rect.size, colorkey, True, tile_cache,
+                chunk_cache=self.parent.chunk_cache)
+        else:
+            # with prefetch, 3 cells of the padding are ahead of the camera
+            self.map_layer = pyscroll.BufferedRenderer(
+                md, self.rect.size, colorkey, 4, True, tile_cache)
+        self.map_layer.object_cache = self.parent.object_cache
         self.map_height = md.height * md.tileheight
         self.center()
-        self.map_layer.blank = True
 
         #self.camera_vector = pymunk.Vec2d(rect.center)
 
         if self.draw_overlay:
+            # the physics are drawn in map units, then scaled to the screen
             md = self.parent.map_data
-            height = md.height * md.tileheight
-            width = md.width * md.width
+            height = md.height * md.tileheight // self.scale
+            width = md.width * md.tilewidth // self.scale
             self.overlay_surface = pygame.Surface((width, height))
             self.overlay_surface.set_colorkey((0, 0, 0))
             alpha = config.getint('display', 'physics-overlay-alpha')
@@ -312,8 +344,8 @@ class ViewPort(pygame.sprite.Sprite):
             return
 
         if self.following:
-            v = Vec2d(self.following.position)
-            v.y = self.map_height - v.y - 30
+            v = Vec2d(self.following.position) * self.scale
+            v.y = self.map_height - v.y - 30 * self.scale
             self.camera_vector = v
 
         if self.camera_vector:
@@ -321,6 +353,8 @@ class ViewPort(pygame.sprite.Sprite):
 
     def update(self, delta):
         self.center()
+        if self.map_layer is not None:
+            self.map_layer.update(delta)
 
     def draw(self, surface, rect):
         if not rect == self.rect:
@@ -354,25 +388,36 @@ class ViewPort(pygame.sprite.Sprite):
                         new_rect = new_rect.move(xx, yy)
                         to_draw_append((sprite.image, new_rect, 0))
 
+        dirty = list()
         if self.draw_map and self.draw_sprites:
-            self.map_layer.draw(surface, self.rect, to_draw)
+            dirty = self.map_layer.draw(surface, self.rect, to_draw)
 
         elif self.draw_sprites:
-            for s, r, l in to_draw:
-                surface_blit(s, r)
+            dirty = [surface_blit(s, r) for s, r, l in to_draw]
 
         elif self.draw_map:
-            self.map_layer.draw(surface, self.rect)
+            dirty = self.map_layer.draw(surface, self.rect)
 
         if self.draw_overlay:
             overlay = self.overlay_surface
-            overlay.set_clip(camera)
+            scale = self.scale
+            area = pygame.Rect(camera.left // scale, camera.top // scale,
+                               camera.width // scale, camera.height // scale)
+            area = area.clip(overlay.get_rect())
+            overlay.set_clip(area)
             overlay.fill((0, 0, 0))
             pymunk_draw(overlay, self.parent.space)
-            surface.blit(overlay, (xx, yy))
-
-        # TODO: dirty updates
-        return self.rect
+            image = overlay.subsurface(area)
+            if scale != 1:
+                image = pygame.transform.scale(
+                    image, (area.width * scale, area.height * scale))
+                image.set_colorkey(overlay.get_colorkey())
+                image.set_alpha(overlay.get_alpha())
+            surface.blit(image, (area.left * scale + xx,
+                                 area.top * scale + yy))
+            dirty = [self.rect]
+
+        return dirty
 
 
 def make_hitbox(body, rect):
@@ -1,11 +1,11 @@
 import pygame
 from . import resources
 
-__all__ = ['TextSprite']
+__all__ = ['TextSprite', 'DirtyUpdates']
 
 
 class TextSprite(pygame.sprite.DirtySprite):
-    def __init__(self, text, color=None, bgcolor=None):
+    def __init__(self, text, color=None, bgcolor=None, size=12):
         super(TextSprite, self).__init__()
         self._text_object = None
         self._text = None
@@ -16,14 +16,14 @@ class TextSprite(pygame.sprite.DirtySprite):
         self.bgcolor = bgcolor
         self.image = None
         self.rect = pygame.Rect(0, 0, 1, 1)
-        self.font = pygame.font.Font(resources.fonts['default'], 12)
+        self.font = pygame.font.Font(resources.fonts['default'], size)
         self.update_image()
 
     def update(self, dt=None):
         text = str(self._text_object)
         if not text == self._text:
             self._text = text
-            self.update()
+            self.update_image()
 
     def update_image(self):
         self.image = self.font.render(self._text, 0, self._color, self._bgcolor)
@@ -76,3 +76,34 @@ class TextSprite(pygame.sprite.DirtySprite):
             self._text_object = value
             self._text = text
             self.update()
+
+
+class DirtyUpdates(pygame.sprite.OrderedUpdates):
+    """ Group that only returns the rects of sprites that changed
+
+    Sprites are drawn every time, but a rect is only returned when a sprite
+    is dirty or has moved.  The dirty flag is cleared, unless it is 2.
+    """
+
+    def draw(self, surface):
+        spritedict = self.spritedict
+        surface_blit = surface.blit
+        dirty = self.lostsprites
+        self.lostsprites = []
+
+        for spr in self.sprites():
+            old_rect = spritedict[spr]
+            new_rect = surface_blit(spr.image, spr.rect)
+            if not old_rect:
+                dirty.append(new_rect)
+            elif new_rect.colliderect(old_rect):
+                if spr.dirty or new_rect != old_rect:
+                    dirty.append(new_rect.union(old_rect))
+            else:
+                dirty.append(new_rect)
+                dirty.append(old_rect)
+            if spr.dirty == 1:
+                spr.dirty = 0
+            spritedict[spr] = new_rect
+
+        return dirty